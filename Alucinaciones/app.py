@@ -1,5 +1,6 @@
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from typing import Optional
 import re  # <-- FIX: se usa en Tab 5
 
 import streamlit as st
@@ -8,13 +9,30 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 from src.pdf_extract import extract_text_pages
+from src.doc_text import DocumentText
 from src.references import slice_references_section, extract_reference_lines
-from src.doi_extract import extract_dois_from_text, assign_page
+from src.doi_extract import scan_dois, assign_page
 from src.doi_validate import validate_doi_http
+from src.resolver import DOIResolver
+from src.singleflight import SingleFlightCache
 from src.metadata import crossref_title_by_doi, crossref_search_by_bibliographic
+from src.biblio_index import BibliographicIndex, open_default_index
 from src.reporting import to_dataframe, make_txt_report
 
 
+@st.cache_resource
+def get_biblio_index() -> Optional[BibliographicIndex]:
+    """Índice bibliográfico local (BIBLIO_INDEX_PATH / CROSSREF_SNAPSHOT_PATH), si existe."""
+    return open_default_index()
+
+
+@st.cache_resource
+def get_resolver() -> DOIResolver:
+    """Pool keep-alive compartido por todos los hilos de validación (uno solo,
+    dimensionado para el máximo de hilos del slider)."""
+    return DOIResolver(pool_size=20)
+
+
 def unique_keep_order(items):
     """Elimina duplicados manteniendo el orden (evita error de PyArrow/Streamlit)."""
     return list(dict.fromkeys(items))
@@ -38,8 +56,8 @@ with st.sidebar:
 
 uploaded_file = st.file_uploader("Selecciona un PDF", type=["pdf"])
 
-if "doi_cache" not in st.session_state:
-    st.session_state["doi_cache"] = {}
+if not isinstance(st.session_state.get("doi_cache"), SingleFlightCache):
+    st.session_state["doi_cache"] = SingleFlightCache()
 if "results_df" not in st.session_state:
     st.session_state["results_df"] = None
 
@@ -48,7 +66,7 @@ if uploaded_file is not None:
     pages_text, method = extract_text_pages(uploaded_file)
     st.success(f"Texto extraído usando: {method} | Páginas: {len(pages_text)}")
 
-    full_text = "\n".join(pages_text)
+    full_text = DocumentText.from_pages(pages_text, normalized=True)
     ref_text, s_line, e_line = slice_references_section(full_text)
     ref_detected = s_line is not None
 
@@ -57,18 +75,18 @@ if uploaded_file is not None:
     else:
         st.warning("No se detectó encabezado claro de referencias. Se usa documento completo.")
 
-    dois_info = extract_dois_from_text(ref_text if ref_detected else full_text)
+    dois_info = scan_dois(ref_text if ref_detected else full_text)
 
     # fallback si detectó referencias pero encontró muy pocos
     if ref_detected and len(dois_info) < 3:
-        more = extract_dois_from_text(full_text)
+        more = scan_dois(full_text)
         seen = {d["doi"].lower() for d in dois_info}
         for d in more:
             if d["doi"].lower() not in seen:
                 dois_info.append(d)
                 seen.add(d["doi"].lower())
 
-    assign_page(dois_info, pages_text)
+    assign_page(dois_info, full_text)
     st.write(f"DOIs únicos encontrados: **{len(dois_info)}**")
 
     if len(dois_info) == 0:
@@ -80,10 +98,11 @@ if uploaded_file is not None:
 
         cache = st.session_state["doi_cache"]
         rows = []
+        resolver = get_resolver()
 
         with ThreadPoolExecutor(max_workers=int(workers)) as ex:
             futures = {
-                ex.submit(validate_doi_http, d["doi"], float(timeout), int(retries), cache): d
+                ex.submit(validate_doi_http, d["doi"], float(timeout), int(retries), cache, resolver): d
                 for d in dois_info
             }
             done = 0
@@ -257,7 +276,7 @@ if df is not None and len(df) > 0:
                 st.info("Sube un PDF para habilitar esta sección.")
             else:
                 pages_text, _ = extract_text_pages(uploaded_file)
-                full_text = "\n".join(pages_text)
+                full_text = DocumentText.from_pages(pages_text, normalized=True)
                 ref_text, _, _ = slice_references_section(full_text)
                 ref_lines = extract_reference_lines(ref_text)
 
@@ -266,9 +285,14 @@ if df is not None and len(df) > 0:
                 candidates = candidates[: int(max_ref_lines)]
 
                 out_rows = []
-                with st.spinner("Buscando coincidencias (Crossref)..."):
-                    for ln in candidates:
-                        title, doi, source = crossref_search_by_bibliographic(ln, timeout=float(timeout))
+                index = get_biblio_index()
+                with st.spinner("Buscando coincidencias (índice local)..." if index else "Buscando coincidencias (Crossref)..."):
+                    if index is not None:
+                        # un solo lote local en lugar de una consulta por línea
+                        matches = [(c[0][:3] if c else (None, None, None)) for c in index.search_many(candidates, k=1)]
+                    else:
+                        matches = [crossref_search_by_bibliographic(ln, timeout=float(timeout)) for ln in candidates]
+                    for ln, (title, doi, source) in zip(candidates, matches):
                         if title or doi:
                             out_rows.append(
                                 {
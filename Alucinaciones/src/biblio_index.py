@@ -0,0 +1,186 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from .snapshot import CrossrefSnapshot, compact_record, default_snapshot_path, iter_dump_records
+
+# (title, doi, container_or_publisher, score)
+Candidate = Tuple[Optional[str], Optional[str], Optional[str], float]
+
+_TABLE = "works_fts"
+# la reconstrucción se hace aquí y se renombra a `works_fts` al terminar
+_BUILD_TABLE = "works_fts_build"
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE {table} USING fts5(
+    doi UNINDEXED,
+    title,
+    authors,
+    container,
+    publisher UNINDEXED,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+"""
+
+# pesos BM25 por columna: doi, title, authors, container, publisher
+_BM25_WEIGHTS = (0.0, 4.0, 1.5, 1.0, 0.0)
+_MAX_QUERY_TERMS = 32
+
+_TOKEN = re.compile(r"[^\W_]{3,}", re.UNICODE)
+_STOP = {
+    "the", "and", "for", "with", "from", "into", "of", "on", "in", "to", "an",
+    "los", "las", "del", "con", "para", "por", "una", "uno", "que", "sobre",
+    "vol", "pp", "doi", "http", "https", "www", "org", "journal", "revista",
+}
+
+
+def default_index_path() -> Optional[str]:
+    return os.environ.get("BIBLIO_INDEX_PATH") or default_snapshot_path()
+
+
+def _query_terms(ref_line: str) -> List[str]:
+    t = unicodedata.normalize("NFKC", ref_line or "").lower()
+    terms = []
+    for tok in _TOKEN.findall(t):
+        if tok in _STOP or tok.isdigit() or tok in terms:
+            continue
+        terms.append(tok)
+    return terms[:_MAX_QUERY_TERMS]
+
+
+class BibliographicIndex:
+    """Índice invertido local (SQLite FTS5, ranking BM25) sobre títulos, autores y revistas.
+
+    Sustituye a `crossref_search_by_bibliographic` para inferir DOIs faltantes
+    sin red: las consultas son CPU/IO locales y pueden paralelizarse por hilos
+    (una conexión por hilo). Abrirlo no escribe en la base: la tabla se crea al
+    construir el índice (`build_from_dumps` / `build_from_snapshot`).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            self._local.conn = conn
+        return conn
+
+    # -----------------------------------------------------
+    # Construcción
+    # -----------------------------------------------------
+    def exists(self) -> bool:
+        return (
+            self._conn().execute("SELECT 1 FROM sqlite_master WHERE name = ?", (_TABLE,)).fetchone() is not None
+        )
+
+    def _insert(self, rows: Iterable[Tuple], batch_size: int = 10000, dedupe: bool = False) -> int:
+        """Reconstruye el índice completo en una tabla aparte y la intercambia por
+        `works_fts` en una sola transacción al final: los lectores siguen viendo el
+        índice anterior entero hasta el cambio, una construcción interrumpida no lo
+        toca e indexar dos veces no duplica candidatos. Con `dedupe`, un DOI repetido
+        en la entrada se indexa una sola vez (gana la primera aparición)."""
+        conn = self._conn()
+        # restos de una construcción interrumpida
+        conn.execute(f"DROP TABLE IF EXISTS {_BUILD_TABLE}")
+        conn.execute(_SCHEMA.format(table=_BUILD_TABLE))
+        insert = f"INSERT INTO {_BUILD_TABLE} VALUES (?,?,?,?,?)"
+        total = 0
+        batch = []
+        seen = set()
+        for key, title, container, publisher, authors, _year in rows:
+            if not title:
+                continue
+            if dedupe:
+                if key in seen:
+                    continue
+                seen.add(key)
+            names = " ".join(json.loads(authors)) if authors else ""
+            batch.append((key, title, names, container or "", publisher or ""))
+            if len(batch) >= batch_size:
+                with conn:
+                    conn.executemany(insert, batch)
+                total += len(batch)
+                batch.clear()
+        if batch:
+            with conn:
+                conn.executemany(insert, batch)
+            total += len(batch)
+        # sin BEGIN explícito, sqlite3 confirma cada DDL por separado
+        conn.execute("BEGIN")
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {_TABLE}")
+            conn.execute(f"ALTER TABLE {_BUILD_TABLE} RENAME TO {_TABLE}")
+        return total
+
+    def build_from_dumps(self, paths: Iterable[str]) -> int:
+        """Indexa directamente un volcado Crossref (mismo formato que `snapshot.py`)."""
+        rows = (compact_record(item) for p in paths for item in iter_dump_records(p))
+        # un mismo DOI puede venir en varios volcados (o repetido dentro de uno)
+        return self._insert((r for r in rows if r is not None), dedupe=True)
+
+    def build_from_snapshot(self, snapshot: CrossrefSnapshot) -> int:
+        """Indexa los registros de un `CrossrefSnapshot` ya ingerido."""
+        cur = snapshot._conn().execute("SELECT key, title, container, publisher, authors, year FROM works")
+        return self._insert(cur)
+
+    def optimize(self) -> None:
+        with self._conn() as conn:
+            conn.execute("INSERT INTO works_fts(works_fts) VALUES ('optimize')")
+
+    # -----------------------------------------------------
+    # Búsqueda
+    # -----------------------------------------------------
+    def search(self, ref_line: str, k: int = 5) -> List[Candidate]:
+        """Top-k candidatos `(title, doi, container_or_publisher, score)`; score mayor = mejor."""
+        q = (ref_line or "").strip()
+        if len(q) < 20:
+            return []
+        terms = _query_terms(q)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
+        weights = ", ".join(str(w) for w in _BM25_WEIGHTS)
+        rows = self._conn().execute(
+            f"SELECT title, doi, container, publisher, bm25(works_fts, {weights}) AS rank "
+            f"FROM works_fts WHERE works_fts MATCH ? ORDER BY rank LIMIT ?",
+            (match, int(k)),
+        ).fetchall()
+        return [(title, doi, (container or publisher or None), -rank) for title, doi, container, publisher, rank in rows]
+
+    def search_many(self, ref_lines: List[str], k: int = 5, workers: int = 4) -> List[List[Candidate]]:
+        """Busca un lote de referencias en una llamada (en paralelo, orden preservado)."""
+        if workers <= 1 or len(ref_lines) < 2:
+            return [self.search(ln, k) for ln in ref_lines]
+        with ThreadPoolExecutor(max_workers=int(workers)) as ex:
+            return list(ex.map(lambda ln: self.search(ln, k), ref_lines))
+
+    def search_bibliographic(self, ref_line: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Misma forma que `crossref_search_by_bibliographic`: (title, doi, container_or_publisher)."""
+        top = self.search(ref_line, k=1)
+        if not top:
+            return None, None, None
+        title, doi, source, _ = top[0]
+        return title, doi, source
+
+    def is_empty(self) -> bool:
+        if not self.exists():
+            return True
+        return self._conn().execute("SELECT 1 FROM works_fts LIMIT 1").fetchone() is None
+
+
+def open_default_index() -> Optional[BibliographicIndex]:
+    """Índice de `BIBLIO_INDEX_PATH` (o del snapshot Crossref) si ya está construido y tiene
+    documentos. Solo lee: no crea la tabla FTS5 en la base."""
+    path = default_index_path()
+    if not path or not os.path.exists(path):
+        return None
+    index = BibliographicIndex(path)
+    return None if index.is_empty() else index
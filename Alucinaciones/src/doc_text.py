@@ -0,0 +1,100 @@
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Union
+
+from .pdf_extract import normalize_text
+
+
+class DocumentText:
+    """Texto de un documento normalizado una sola vez, con el desplazamiento donde
+    empieza cada página.
+
+    `text` es la unión de las páginas con "\\n"; `page_at(pos)` traduce una posición
+    de `text` a su número de página (búsqueda binaria sobre los desplazamientos).
+    Los recortes (`slice`) comparten la numeración del documento original, así una
+    posición dentro de la bibliografía sigue dando la página real del PDF.
+    """
+
+    __slots__ = ("text", "starts", "first_page", "_lower")
+
+    def __init__(self, text: str, starts: Optional[List[int]] = None, first_page: int = 1):
+        # sin normalizar: usar `from_pages` / `from_text`
+        self.text = text
+        self.starts = starts or [0]
+        self.first_page = int(first_page)
+        self._lower: Optional[str] = None
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[str], first_page: int = 1, normalized: bool = False) -> "DocumentText":
+        """`normalized=True` si las páginas ya pasaron por `normalize_text`
+        (las de `extract_pages` / `extract_page_range` ya vienen normalizadas)."""
+        parts: List[str] = []
+        starts: List[int] = []
+        offset = 0
+        for page in pages:
+            page = page or ""
+            if not normalized:
+                page = normalize_text(page)
+            starts.append(offset)
+            parts.append(page)
+            offset += len(page) + 1
+        return cls("\n".join(parts), starts or [0], first_page)
+
+    @classmethod
+    def from_text(cls, text: Union[str, "DocumentText"], first_page: int = 1) -> "DocumentText":
+        """Texto sin páginas (una sola); un `DocumentText` se devuelve tal cual."""
+        if isinstance(text, DocumentText):
+            return text
+        return cls(normalize_text(text or ""), [0], first_page)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"DocumentText({len(self.text)} chars, pages {self.first_page}-{self.last_page})"
+
+    @property
+    def n_pages(self) -> int:
+        return len(self.starts)
+
+    @property
+    def last_page(self) -> int:
+        return self.first_page + len(self.starts) - 1
+
+    @property
+    def lower(self) -> str:
+        """`text` en minúsculas (calculado una vez), con las mismas posiciones que `text`."""
+        if self._lower is None:
+            low = self.text.lower()
+            if len(low) != len(self.text):
+                # p. ej. "İ" pasa a dos caracteres: se deja tal cual para no desplazar posiciones
+                low = "".join(c if len(c.lower()) != 1 else c.lower() for c in self.text)
+            self._lower = low
+        return self._lower
+
+    @property
+    def pages(self) -> List[str]:
+        ends = self.starts[1:] + [len(self.text) + 1]
+        return [self.text[s : e - 1] for s, e in zip(self.starts, ends)]
+
+    def page_at(self, pos: int) -> int:
+        """Número de página (según `first_page`) de la posición `pos` de `text`."""
+        return self.first_page + max(0, bisect_right(self.starts, int(pos)) - 1)
+
+    def slice(self, start: int, end: Optional[int] = None) -> "DocumentText":
+        """Recorte `[start, end)` que conserva la numeración de páginas del original."""
+        n = len(self.text)
+        start = max(0, min(n, int(start)))
+        end = n if end is None else max(start, min(n, int(end)))
+        i0 = max(0, bisect_right(self.starts, start) - 1)
+        starts = [0] + [s - start for s in self.starts[i0 + 1 :] if s < end]
+        return DocumentText(self.text[start:end], starts, self.first_page + i0)
+
+    def find_page(self, needle: str) -> Optional[int]:
+        """Página de la primera aparición de `needle` (sin distinguir mayúsculas), o None."""
+        pos = self.lower.find((needle or "").lower())
+        if not needle or pos < 0:
+            return None
+        return self.page_at(pos)
@@ -1,5 +1,6 @@
 import re
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
+from .doc_text import DocumentText
 from .pdf_extract import normalize_text
 
 DOI_PATTERNS = [
@@ -10,6 +11,24 @@ DOI_PATTERNS = [
     r"(?:DOI|doi|Doi)[\s:]+(10\.\d{4,9}(?:\.\d+)*\/(?:(?![\"&\'<>])\S)+)",
 ]
 
+# Un solo patrón compilado para `scan_dois`. Empieza por el literal "10." (el motor
+# salta directo a los candidatos); el contexto (inicio, espacio, delimitador o URL
+# doi.org) se comprueba mirando hacia atrás. El cuerpo admite cortes de línea tras
+# un guion y espacios junto a "/".
+_DOI_BODY = r"""(?:\s*/\s*|-[ \t]*\n\s*(?=\w)|[^\s"&'<>])+"""
+DOI_SCANNER = re.compile(
+    r"10\.(?:(?<=doi\.org/10\.)|(?<![^\s(\[{,;:]10\.))\d{4,9}(?:\.\d+)*\s*/\s*" + _DOI_BODY,
+    re.IGNORECASE,
+)
+# Etiqueta o URL justo antes del DOI (solo se evalúa sobre unos pocos caracteres)
+_SCAN_URL = re.compile(r"https?://(?:dx\.)?doi\.org/$", re.IGNORECASE)
+_SCAN_LABEL = re.compile(r"doi(?:(\s*:)\s*|\s+)$", re.IGNORECASE)
+_LINE_BREAK = re.compile(r"(?<=-)[ \t]*\n\s*")
+_SPACE = re.compile(r"\s")
+# lo que `clean_doi` quita al final (el cuerpo del escáner ya excluye espacios y entidades HTML)
+_TRAILING_PUNCT = ".,;:)]}'\""
+_SLASH_SPACES = re.compile(r"\s*/\s*")
+
 
 def clean_doi(doi: str) -> str:
     doi = normalize_text(doi)
@@ -27,6 +46,20 @@ def clean_doi(doi: str) -> str:
     return doi.strip()
 
 
+_DOI_KEY_PREFIX = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+
+
+def doi_key(doi: str) -> str:
+    """Clave normalizada de un DOI (para caches y deduplicación): sin prefijo URL/`doi:` y en minúsculas."""
+    return _DOI_KEY_PREFIX.sub("", (doi or "").strip()).strip().lower()
+
+
+def doi_prefix(doi: str) -> Optional[str]:
+    """Prefijo de registrante (`10.xxxx`, en minúsculas) o None si el DOI no tiene forma válida."""
+    m = re.match(r"^(10\.\d{4,9}(?:\.\d+)*)/", doi_key(doi))
+    return m.group(1) if m else None
+
+
 def is_valid_doi_format(doi: str) -> bool:
     if not re.match(r"^10\.\d{4,9}(?:\.\d+)*\/.+$", doi):
         return False
@@ -72,11 +105,66 @@ def extract_dois_from_text(text: str) -> List[Dict]:
     return out
 
 
-def assign_page(dois_info: List[Dict], pages_text: List[str]) -> None:
+def _scan_context(text: str, start: int) -> Tuple[str, int]:
+    """(patrón equivalente de DOI_PATTERNS, inicio de la coincidencia incluida la etiqueta/URL)."""
+    before = text[max(0, start - 24) : start]
+    m = _SCAN_URL.search(before)
+    if m:
+        return "Patrón 2", start - len(before) + m.start()
+    m = _SCAN_LABEL.search(before)
+    if m:
+        return ("Patrón 1" if m.group(1) else "Patrón 5"), start - len(before) + m.start()
+    if start > 0 and text[start - 1] in "([{":
+        return "Patrón 4", start
+    return "Patrón 3", start
+
+
+def scan_dois(text: Union[str, DocumentText], max_context: int = 80) -> List[Dict]:
+    """Extracción de DOIs en una sola pasada sobre el texto.
+
+    Sustituye a las cinco pasadas de `extract_dois_from_text` y a las de
+    normalización + regex de `extract_dois_robust`: los cortes de línea tras un
+    guion y los espacios junto a "/" se reparan solo dentro de cada coincidencia.
+    El guion se conserva: en un DOI el corte cae sobre un guion propio del sufijo.
+    Mismo esquema de salida (`doi`, `raw`, `pattern`, `position`, `context`);
+    `position` es el desplazamiento en `normalize_text(text)`.
+    Con un `DocumentText` no se vuelve a normalizar y cada fila lleva además `page`.
+    """
+    doc = text if isinstance(text, DocumentText) else None
+    t = doc.text if doc is not None else normalize_text(text)
+    out: List[Dict] = []
+    seen = set()
+    for m in DOI_SCANNER.finditer(t):
+        raw = m.group(0)
+        if _SPACE.search(raw):
+            raw = _LINE_BREAK.sub("", _SLASH_SPACES.sub("/", raw))
+        doi = raw.rstrip(_TRAILING_PUNCT)
+        key = doi.lower()
+        if key in seen or not is_valid_doi_format(doi):
+            continue
+        seen.add(key)
+        pattern, position = _scan_context(t, m.start())
+        start = max(position - max_context, 0)
+        end = min(m.end() + max_context, len(t))
+        row = {
+            "doi": doi,
+            "raw": raw,
+            "pattern": pattern,
+            "position": position,
+            "context": " ".join(t[start:end].split()),
+        }
+        if doc is not None:
+            row["page"] = doc.page_at(m.start())
+        out.append(row)
+    return out
+
+
+def assign_page(dois_info: List[Dict], pages_text: Union[List[str], DocumentText]) -> None:
+    """Página de cada DOI: la que ya trae de `scan_dois(DocumentText)` o la de su
+    primera aparición en el documento ("N/A" si no aparece tal cual)."""
+    doc = pages_text if isinstance(pages_text, DocumentText) else DocumentText.from_pages(pages_text, normalized=True)
     for d in dois_info:
-        d["page"] = "N/A"
-        target = d["doi"].lower()
-        for pi, ptxt in enumerate(pages_text, 1):
-            if target in (ptxt or "").lower():
-                d["page"] = pi
-                break
+        if isinstance(d.get("page"), int):
+            continue
+        page = doc.find_page(d["doi"])
+        d["page"] = "N/A" if page is None else page
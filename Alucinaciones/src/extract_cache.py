@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Union
+
+# Sube al cambiar el formato de lo guardado o la lógica de extracción
+CACHE_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS extractions_lru ON extractions(last_access);
+"""
+
+_HASH_CHUNK = 1 << 20
+
+
+def default_extract_cache_path() -> str:
+    return os.environ.get("EXTRACT_CACHE_PATH") or os.path.join(
+        os.path.expanduser("~"), ".cache", "doi_validator", "extract.sqlite3"
+    )
+
+
+def default_extract_cache_bytes() -> int:
+    return int(float(os.environ.get("EXTRACT_CACHE_MAX_MB", "512")) * (1 << 20))
+
+
+def content_digest(source: Union[bytes, bytearray, memoryview, str, "os.PathLike[str]"]) -> str:
+    """SHA-256 del contenido del PDF (bytes o ruta, leída por bloques)."""
+    h = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        h.update(source)
+    else:
+        with open(source, "rb") as fh:
+            for block in iter(lambda: fh.read(_HASH_CHUNK), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def extraction_key(digest: str, kind: str, **params: Any) -> str:
+    """Clave = hash del contenido + tipo de entrada + parámetros que cambian el resultado."""
+    spec = json.dumps({"v": CACHE_VERSION, **params}, sort_keys=True, default=str)
+    return f"{digest}:{kind}:{hashlib.sha1(spec.encode('utf-8')).hexdigest()[:16]}"
+
+
+class ExtractionCache:
+    """Caché en disco de extracciones PDF (SQLite), acotada por tamaño con expulsión LRU.
+
+    Guarda cualquier objeto JSON comprimido con zlib: el texto extraído de un
+    documento (`kind="text"`) y sus filas DOI + líneas de referencia
+    (`kind="rows"`). Un documento sin cambios cuesta un hash en lugar de un
+    parseo completo. Varios procesos pueden compartir el archivo (modo WAL).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = path or default_extract_cache_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.max_bytes = default_extract_cache_bytes() if max_bytes is None else int(max_bytes)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE extractions SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, key: str, value: Any) -> None:
+        payload = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), 6)
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO extractions VALUES (?,?,?,?)", (key, payload, len(payload), time.time())
+                )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # expulsa las menos usadas hasta quedar en ~90 % del límite (evita expulsar en cada escritura)
+        target = total - int(0.9 * self.max_bytes)
+        doomed, freed = [], 0
+        for key, size in self._conn.execute("SELECT key, size FROM extractions ORDER BY last_access"):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        with self._conn:
+            self._conn.executemany("DELETE FROM extractions WHERE key = ?", doomed)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM extractions")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_process_caches: Dict[str, ExtractionCache] = {}
+_process_caches_lock = threading.Lock()
+
+
+def open_extract_cache(path: str, max_bytes: Optional[int] = None) -> ExtractionCache:
+    """Una instancia por ruta y proceso (para workers del pool de extracción)."""
+    with _process_caches_lock:
+        cache = _process_caches.get(path)
+        if cache is None:
+            cache = _process_caches[path] = ExtractionCache(path, max_bytes)
+        return cache
@@ -1,27 +1,193 @@
-from typing import Optional, Tuple
+import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
 import requests
 
+from .doi_extract import doi_key
+from .ratelimit import CROSSREF_HOST, get_gate
+from .snapshot import CrossrefSnapshot, default_snapshot_path
+
+CROSSREF_WORKS = "https://api.crossref.org/works"
+CROSSREF_HEADERS = {"User-Agent": "doi-validator/1.0 (mailto:example@example.com)"}
+# campos mínimos para título/fuente (reduce el tamaño de cada respuesta por lote)
+CROSSREF_SELECT = "DOI,title,container-title,publisher,author,issued"
+
+_snapshot: Optional[CrossrefSnapshot] = None
+_snapshot_loaded = False
+
+
+def set_crossref_snapshot(snapshot: Optional[CrossrefSnapshot]) -> None:
+    """Define el snapshot local que se consulta antes de la API (None lo desactiva)."""
+    global _snapshot, _snapshot_loaded
+    _snapshot, _snapshot_loaded = snapshot, True
+
+
+def get_crossref_snapshot() -> Optional[CrossrefSnapshot]:
+    """Snapshot activo; por defecto el de `CROSSREF_SNAPSHOT_PATH` si el archivo existe."""
+    global _snapshot, _snapshot_loaded
+    if not _snapshot_loaded:
+        path = default_snapshot_path()
+        _snapshot = CrossrefSnapshot(path) if path and os.path.exists(path) else None
+        _snapshot_loaded = True
+    return _snapshot
+
+
+def _title_and_source(data: Dict) -> Tuple[Optional[str], Optional[str]]:
+    title_list = data.get("title") or []
+    title = title_list[0].strip() if title_list else None
+    container = (data.get("container-title") or [None])[0]
+    publisher = data.get("publisher")
+    return title, (container or publisher)
+
+
+class CrossrefUnavailable(Exception):
+    """Crossref no respondió (429, 5xx, timeout, red): no equivale a "no encontrado"."""
+
+
+def _crossref_get(send) -> "requests.Response":
+    try:
+        return get_gate(CROSSREF_HOST).request(send)
+    except requests.RequestException as e:
+        raise CrossrefUnavailable(str(e)) from e
+
+
+def _crossref_work(doi: str, timeout: float) -> Optional[Dict]:
+    """Registro de `/works/{doi}`; None si Crossref no lo tiene (404/400) y
+    `CrossrefUnavailable` si no se pudo consultar."""
+    url = f"{CROSSREF_WORKS}/{doi}"
+    r = _crossref_get(lambda: requests.get(url, headers=CROSSREF_HEADERS, timeout=timeout))
+    if r.status_code in (400, 404):
+        return None
+    if r.status_code != 200:
+        raise CrossrefUnavailable(f"HTTP {r.status_code}")
+    return r.json().get("message", {}) or {}
+
 
 def crossref_title_by_doi(doi: str, timeout: float = 15.0) -> Tuple[Optional[str], Optional[str]]:
     """
     Returns: (title, container_or_publisher)
     """
-    url = f"https://api.crossref.org/works/{doi}"
-    headers = {"User-Agent": "doi-validator/1.0 (mailto:example@example.com)"}
+    snap = get_crossref_snapshot()
+    if snap is not None:
+        item = snap.get(doi)
+        if item is not None:
+            return _title_and_source(item)
     try:
-        r = requests.get(url, headers=headers, timeout=timeout)
-        if r.status_code != 200:
+        data = _crossref_work(doi, timeout)
+        if data is None:
             return None, None
-        data = r.json().get("message", {}) or {}
-        title_list = data.get("title") or []
-        title = title_list[0].strip() if title_list else None
-        container = (data.get("container-title") or [None])[0]
-        publisher = data.get("publisher")
-        return title, (container or publisher)
+        return _title_and_source(data)
     except Exception:
         return None, None
 
 
+def _crossref_works(dois: List[str], timeout: float) -> Tuple[Dict[str, Dict], List[str]]:
+    """Consultas individuales `/works/{doi}`. Returns: (encontrados, claves no consultables)."""
+    out: Dict[str, Dict] = {}
+    failed: List[str] = []
+    for d in dois:
+        try:
+            data = _crossref_work(d, timeout)
+        except Exception:
+            failed.append(doi_key(d))
+            continue
+        if data:
+            out[doi_key(d)] = data
+    return out, failed
+
+
+def _crossref_filter_chunk(dois: List[str], timeout: float) -> Tuple[Dict[str, Dict], List[str]]:
+    """Una sola consulta `/works?filter=doi:a,doi:b,...` para todo el bloque.
+    Solo si Crossref rechaza el filtro (400) recurre a consultas individuales; ante
+    429/5xx/timeout el bloque entero queda como no consultable (sin multiplicar
+    peticiones mientras Crossref está limitando).
+    Returns: (encontrados, claves no consultables).
+    """
+    params = {
+        "filter": ",".join(f"doi:{d}" for d in dois),
+        "rows": len(dois),
+        "select": CROSSREF_SELECT,
+    }
+    out: Dict[str, Dict] = {}
+    try:
+        r = _crossref_get(
+            lambda: requests.get(CROSSREF_WORKS, params=params, headers=CROSSREF_HEADERS, timeout=timeout)
+        )
+        if r.status_code == 200:
+            items = (r.json().get("message", {}) or {}).get("items", []) or []
+    except (CrossrefUnavailable, ValueError):
+        return out, [doi_key(d) for d in dois]
+    if r.status_code == 400:
+        return _crossref_works(dois, timeout)
+    if r.status_code != 200:
+        return out, [doi_key(d) for d in dois]
+    for item in items:
+        k = doi_key(item.get("DOI") or "")
+        if k:
+            out[k] = item
+    return out, []
+
+
+def crossref_records_by_dois(
+    dois: Iterable[str],
+    chunk_size: int = 20,
+    workers: int = 4,
+    timeout: float = 15.0,
+    failed: Optional[List[str]] = None,
+) -> Dict[str, Dict]:
+    """Registros Crossref de muchos DOIs con pocas consultas `/works` filtradas,
+    ejecutadas en paralelo (respetando el gate de api.crossref.org).
+    Returns: {doi_key: registro} solo para los DOIs encontrados. Si se pasa
+    `failed`, recibe las claves que no se pudieron consultar (429/5xx/timeout).
+    """
+    keys = list(dict.fromkeys(k for k in (doi_key(d) for d in dois) if k))
+    out: Dict[str, Dict] = {}
+    # primero el snapshot local; solo los fallos van a la API
+    snap = get_crossref_snapshot()
+    if snap is not None:
+        out.update(snap.get_many(keys))
+        keys = [k for k in keys if k not in out]
+    # una coma dentro del DOI rompe la sintaxis del filtro: esos van por separado
+    plain = [k for k in keys if "," not in k]
+    odd = [k for k in keys if "," in k]
+    chunk_size = max(1, int(chunk_size))
+    chunks = [plain[i : i + chunk_size] for i in range(0, len(plain), chunk_size)]
+    chunks += [[k] for k in odd]
+
+    def lookup(chunk: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+        return _crossref_filter_chunk(chunk, timeout) if "," not in chunk[0] else _crossref_works(chunk, timeout)
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as ex:
+        for part, part_failed in ex.map(lookup, chunks):
+            out.update(part)
+            if failed is not None:
+                failed.extend(part_failed)
+    return out
+
+
+def crossref_titles_by_dois(
+    dois: Iterable[str],
+    chunk_size: int = 20,
+    workers: int = 4,
+    timeout: float = 15.0,
+) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """Versión por lotes de `crossref_title_by_doi`.
+    Returns: {doi_key: (title, container_or_publisher)}; (None, None) si Crossref no
+    lo tiene. Los DOIs que no se pudieron consultar (429/5xx/timeout) no aparecen:
+    no son un "no encontrado" y no deben guardarse como tal.
+    """
+    keys = list(dict.fromkeys(k for k in (doi_key(d) for d in dois) if k))
+    failed: List[str] = []
+    records = crossref_records_by_dois(keys, chunk_size=chunk_size, workers=workers, timeout=timeout, failed=failed)
+    skip = set(failed)
+    return {k: (_title_and_source(records[k]) if k in records else (None, None)) for k in keys if k not in skip}
+
+
 def crossref_search_by_bibliographic(ref_line: str, timeout: float = 15.0) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     """
     Returns: (matched_title, matched_doi, matched_container_or_publisher)
@@ -30,22 +196,165 @@ def crossref_search_by_bibliographic(ref_line: str, timeout: float = 15.0) -> Tu
     if len(q) < 20:
         return None, None, None
 
-    url = "https://api.crossref.org/works"
     params = {"query.bibliographic": q, "rows": 1}
-    headers = {"User-Agent": "doi-validator/1.0 (mailto:example@example.com)"}
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=timeout)
+        r = get_gate(CROSSREF_HOST).request(
+            lambda: requests.get(CROSSREF_WORKS, params=params, headers=CROSSREF_HEADERS, timeout=timeout)
+        )
         if r.status_code != 200:
             return None, None, None
         items = (r.json().get("message", {}) or {}).get("items", []) or []
         if not items:
             return None, None, None
         item = items[0]
-        title_list = item.get("title") or []
-        title = title_list[0].strip() if title_list else None
-        doi = item.get("DOI")
-        container = (item.get("container-title") or [None])[0]
-        publisher = item.get("publisher")
-        return title, doi, (container or publisher)
+        title, source = _title_and_source(item)
+        return title, item.get("DOI"), source
     except Exception:
         return None, None, None
+
+
+# =========================================================
+# Similitud de títulos (bibliografía vs Crossref), por lotes
+# =========================================================
+# Ya sin acentos: se filtran después de normalizar
+STOPWORDS_ES = frozenset(
+    "a al algo algun alguna algunas alguno algunos ante como con contra cual cuando de del desde donde"
+    " durante e el ella ellas ellos en entre es esa esas ese eso esos esta estas este esto estos fue ha"
+    " hacia hasta la las le les lo los mas me mediante mi muy ni no nos o os otra otras otro otros para"
+    " pero por porque que se segun ser si sin sobre son su sus tambien tras tu u un una unas uno unos y ya".split()
+)
+STOPWORDS_EN = frozenset(
+    "a about after against all also an and any are as at be been before being between both but by can"
+    " did do does during each for from had has have how if in into is it its itself more most no nor not"
+    " of off on once only or other our out over own same should so some such than that the their them"
+    " then there these they this those through to too under until up upon very was we were what when"
+    " where which while who whom why will with within without you your".split()
+)
+TITLE_STOPWORDS = STOPWORDS_ES | STOPWORDS_EN
+
+TITLE_NGRAM = 3  # n-gramas de caracteres (máx. 3: cada uno se codifica en un int64)
+TITLE_TOKEN_WEIGHT = 0.4  # peso de las palabras; el resto, n-gramas (tolera erratas y cortes de OCR)
+
+_TITLE_SPLIT = re.compile(r"[\W_]+")
+_COMBINING = re.compile("[\u0300-\u036f]")
+
+
+def _blank(value: Any) -> bool:
+    if value is None or (isinstance(value, float) and value != value):
+        return True
+    return not str(value).strip()
+
+
+@lru_cache(maxsize=65536)
+def normalize_title(title: str) -> str:
+    """Minúsculas, sin acentos, puntuación ni stopwords ES/EN (si el título solo
+    tiene stopwords, se conservan)."""
+    text = title or ""
+    if not text.isascii():
+        text = _COMBINING.sub("", unicodedata.normalize("NFKD", text))
+    tokens = [t for t in _TITLE_SPLIT.split(text.casefold()) if t]
+    content = [t for t in tokens if t not in TITLE_STOPWORDS]
+    return " ".join(content or tokens)
+
+
+def _sorted_unique(a: np.ndarray) -> np.ndarray:
+    # por ordenación (más rápido aquí que `np.unique`, que puede ir por hash)
+    a = np.sort(a)
+    keep = np.ones(len(a), dtype=bool)
+    keep[1:] = a[1:] != a[:-1]
+    return a[keep]
+
+
+def _dense_ids(codes: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Códigos enteros arbitrarios → ids 0..k-1 (mismo código, mismo id), y k."""
+    order = np.argsort(codes)
+    ranked = codes[order]
+    step = np.zeros(len(codes), dtype=np.int64)
+    step[1:] = ranked[1:] != ranked[:-1]
+    ids = np.empty(len(codes), dtype=np.int64)
+    ids[order] = np.cumsum(step)
+    return ids, (int(ids[order[-1]]) + 1 if len(codes) else 1)
+
+
+def _dice_by_row(left: Tuple[np.ndarray, np.ndarray], right: Tuple[np.ndarray, np.ndarray], n: int) -> np.ndarray:
+    """Dice `2|A∩B| / (|A|+|B|)` fila a fila para dos columnas de conjuntos dadas
+    como pares (fila, código). Los códigos pasan a un vocabulario denso común y
+    cada par a una clave entera única: los repetidos y la intersección de todas
+    las filas salen de unas pocas ordenaciones, sin recorrer fila a fila.
+    """
+    (l_rows, l_codes), (r_rows, r_codes) = left, right
+    ids, width = _dense_ids(np.concatenate([l_codes, r_codes]))
+    l_keys = _sorted_unique(l_rows * width + ids[: len(l_codes)])
+    r_keys = _sorted_unique(r_rows * width + ids[len(l_codes) :])
+    common = np.intersect1d(l_keys, r_keys, assume_unique=True)
+    inter = np.bincount(common // width, minlength=n)
+    total = np.bincount(l_keys // width, minlength=n) + np.bincount(r_keys // width, minlength=n)
+    return np.where(total > 0, 2.0 * inter / np.maximum(total, 1), np.nan)
+
+
+def _token_pairs(norms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # palabras → hash entero (64 bits; colisiones despreciables a esta escala)
+    tokens = [t.split() for t in norms]
+    sizes = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+    codes = np.fromiter((hash(w) for t in tokens for w in t), dtype=np.int64, count=int(sizes.sum()))
+    return np.repeat(np.arange(len(norms), dtype=np.int64), sizes), codes
+
+
+def _ngram_pairs(norms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # n-gramas de caracteres sobre " título ", calculados en bloque sobre los code points
+    padded = [f" {t} " if t else "" for t in norms]
+    sizes = np.fromiter((len(t) for t in padded), dtype=np.int64, count=len(padded))
+    chars = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    rows = np.repeat(np.arange(len(norms), dtype=np.int64), sizes)
+    k = TITLE_NGRAM
+    if len(chars) < k:
+        return rows[:0], chars[:0]
+    # 21 bits por code point: hasta 3 caracteres caben exactos en un int64
+    codes = chars[: len(chars) - k + 1].copy()
+    for j in range(1, k):
+        codes = (codes << 21) | chars[j : len(chars) - k + 1 + j]
+    start_rows = rows[: len(chars) - k + 1]
+    same = start_rows == rows[k - 1 :]  # el n-grama no cruza al título siguiente
+    return start_rows[same], codes[same]
+
+
+def title_match_scores(
+    ref_titles: Iterable[Any],
+    crossref_titles: Iterable[Any],
+    token_weight: float = TITLE_TOKEN_WEIGHT,
+) -> np.ndarray:
+    """Similitud (0..1) de dos columnas alineadas de títulos, calculada de una vez:
+    mezcla de Dice sobre palabras y sobre n-gramas de caracteres de los títulos
+    normalizados. NaN donde falta alguno de los dos títulos.
+    """
+    refs = list(ref_titles)
+    crs = list(crossref_titles)
+    if len(refs) != len(crs):
+        raise ValueError("Las columnas de títulos deben tener la misma longitud")
+    n = len(refs)
+    missing = np.fromiter((_blank(a) or _blank(b) for a, b in zip(refs, crs)), dtype=bool, count=n)
+    left = ["" if miss else normalize_title(str(t)) for t, miss in zip(refs, missing)]
+    right = ["" if miss else normalize_title(str(t)) for t, miss in zip(crs, missing)]
+    tokens = _dice_by_row(_token_pairs(left), _token_pairs(right), n)
+    grams = _dice_by_row(_ngram_pairs(left), _ngram_pairs(right), n)
+    scores = token_weight * tokens + (1.0 - token_weight) * grams
+    scores[missing] = np.nan
+    return scores
+
+
+def title_match_labels(scores: Iterable[Optional[float]], threshold: float) -> np.ndarray:
+    """"match" / "mismatch" según `threshold`; "unknown" sin puntuación (NaN o None)."""
+    s = np.array([np.nan if v is None else v for v in scores], dtype=float)
+    return np.where(np.isnan(s), "unknown", np.where(s >= threshold, "match", "mismatch"))
+
+
+def title_match_score(ref_title: Any, crossref_title: Any) -> Optional[float]:
+    """Similitud de un par de títulos (0..1, 3 decimales); None si falta alguno."""
+    score = title_match_scores([ref_title], [crossref_title])[0]
+    return None if np.isnan(score) else round(float(score), 3)
+
+
+def title_match_label(score: Optional[float], threshold: float = 0.78) -> str:
+    if score is None or score != score:
+        return "unknown"
+    return "match" if score >= threshold else "mismatch"
@@ -1,7 +1,43 @@
+import multiprocessing
+import os
+import re
+import threading
+import time
 import unicodedata
-from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import pdfplumber
 
+# Optional text engines (solo texto plano, sin objetos por carácter)
+try:
+    import fitz  # type: ignore  # PyMuPDF
+except Exception:  # pragma: no cover
+    fitz = None
+
+try:
+    import pypdfium2 as pdfium  # type: ignore
+except Exception:  # pragma: no cover
+    pdfium = None
+
+try:
+    from pypdf import PdfReader  # type: ignore
+except Exception:  # pragma: no cover
+    try:
+        from PyPDF2 import PdfReader  # type: ignore
+    except Exception:  # pragma: no cover
+        PdfReader = None  # type: ignore
+
+# Documentos con menos páginas se extraen en el proceso actual (arrancar workers cuesta más)
+PAGE_SHARD_THRESHOLD = int(os.environ.get("PDF_PAGE_SHARD_THRESHOLD", "60"))
+_MIN_SHARD_PAGES = 8
+
+PdfSource = Union[bytes, str, "os.PathLike[str]"]
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_workers = 0
+_pdf_pool_lock = threading.Lock()
+
 
 def normalize_text(t: str) -> str:
     t = unicodedata.normalize("NFKC", t or "")
@@ -10,12 +46,283 @@ def normalize_text(t: str) -> str:
     return t
 
 
-def extract_text_pages(pdf_file) -> Tuple[List[str], str]:
-    pages_text: List[str] = []
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            pages_text.append(normalize_text(page.extract_text() or ""))
-    method = "pdfplumber"
+def get_pdf_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Pool de procesos compartido por el proceso; solo se recrea si hacen falta
+    más workers (el anterior termina lo que tenga en curso) o si quedó roto.
+    Usa `spawn`: la app llama desde hilos y `fork` con hilos vivos no es seguro.
+    """
+    global _pdf_pool, _pdf_pool_workers
+    n = max(1, int(workers or os.cpu_count() or 1))
+    with _pdf_pool_lock:
+        broken = _pdf_pool is not None and getattr(_pdf_pool, "_broken", False)
+        if _pdf_pool is None or n > _pdf_pool_workers or broken:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown(wait=False)
+            _pdf_pool = ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("spawn"))
+            _pdf_pool_workers = n
+        return _pdf_pool
+
+
+# =========================================================
+# Motores de extracción: (contar páginas, texto de [start, end))
+# =========================================================
+def _as_stream(source: PdfSource):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return BytesIO(bytes(source))
+    return source
+
+
+def _plumber_count(source: PdfSource) -> int:
+    with pdfplumber.open(_as_stream(source)) as pdf:
+        return len(pdf.pages)
+
+
+def _plumber_pages(source: PdfSource, start: int, end: Optional[int]) -> List[str]:
+    with pdfplumber.open(_as_stream(source)) as pdf:
+        out: List[str] = []
+        for page in pdf.pages[start:end]:
+            out.append(page.extract_text() or "")
+            page.close()  # libera la caché de objetos de la página
+        return out
+
+
+def _pypdf_count(source: PdfSource) -> int:
+    return len(PdfReader(_as_stream(source)).pages)
+
+
+def _pypdf_pages(source: PdfSource, start: int, end: Optional[int]) -> List[str]:
+    reader = PdfReader(_as_stream(source))
+    out: List[str] = []
+    for i in range(len(reader.pages))[start:end]:
+        try:
+            out.append(reader.pages[i].extract_text() or "")
+        except Exception:
+            out.append("")
+    return out
+
+
+# PDFium no es seguro entre hilos: un documento a la vez por proceso
+_pdfium_lock = threading.Lock()
+
+
+def _pdfium_open(source: PdfSource):
+    return pdfium.PdfDocument(bytes(source) if isinstance(source, (bytearray, memoryview)) else source)
+
+
+def _pdfium_count(source: PdfSource) -> int:
+    with _pdfium_lock:
+        pdf = _pdfium_open(source)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def _pdfium_pages(source: PdfSource, start: int, end: Optional[int]) -> List[str]:
+    out: List[str] = []
+    with _pdfium_lock:
+        pdf = _pdfium_open(source)
+        try:
+            for i in range(len(pdf))[start:end]:
+                page = pdf[i]
+                textpage = page.get_textpage()
+                out.append(textpage.get_text_range() or "")
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+    return out
+
+
+def _fitz_open(source: PdfSource):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def _fitz_count(source: PdfSource) -> int:
+    with _fitz_open(source) as doc:
+        return doc.page_count
+
+
+def _fitz_pages(source: PdfSource, start: int, end: Optional[int]) -> List[str]:
+    with _fitz_open(source) as doc:
+        return [doc[i].get_text() or "" for i in range(doc.page_count)[start:end]]
+
+
+Backend = Tuple[Callable[[PdfSource], int], Callable[[PdfSource, int, Optional[int]], List[str]]]
+
+BACKENDS: Dict[str, Backend] = {"pdfplumber": (_plumber_count, _plumber_pages)}
+if PdfReader is not None:
+    BACKENDS["pypdf"] = (_pypdf_count, _pypdf_pages)
+if pdfium is not None:
+    BACKENDS["pdfium"] = (_pdfium_count, _pdfium_pages)
+if fitz is not None:
+    BACKENDS["pymupdf"] = (_fitz_count, _fitz_pages)
+
+# "fast": primer motor de solo texto disponible
+_FAST_ORDER = ("pymupdf", "pdfium", "pypdf")
+FAST_BACKEND = next((b for b in _FAST_ORDER if b in BACKENDS), "pdfplumber")
+
+
+# Solo compensa repartir en procesos los motores lentos (los de solo texto van a <1 ms/página)
+_SHARDED_BACKENDS = {"pdfplumber", "pypdf"}
+
+
+def available_backends() -> List[str]:
+    return ["auto", "fast"] + list(BACKENDS)
+
+
+def _backend_name(backend: str) -> str:
+    if backend in ("auto", "fast"):
+        return FAST_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Motor PDF no disponible: {backend!r} (disponibles: {', '.join(available_backends())})")
+    return backend
+
+
+# =========================================================
+# Política "auto": motor rápido y pdfplumber solo si el texto parece degradado
+# =========================================================
+_MIN_CHARS_PER_PAGE = 200
+_BAD_GLYPHS = re.compile(r"\(cid:\d+\)|\ufffd")
+_DOI_OK = re.compile(r"\b10\.\d{4,9}/\S")
+_DOI_BROKEN = re.compile(r"\b10\.\d{4,9}\s+/|\b10\s*\.\s+\d{4,9}|doi\.org/\s+10\.")
+
+
+def text_quality(pages: List[str]) -> Dict[str, float]:
+    text = "".join(pages)
+    # las páginas en blanco (finales, separadores) no bajan la media por página
+    n = max(1, sum(1 for p in pages if p.strip()))
+    return {
+        "chars_per_page": len(text.strip()) / n,
+        "bad_glyph_ratio": len(_BAD_GLYPHS.findall(text)) / max(1, len(text)),
+        "dois_ok": len(_DOI_OK.findall(text)),
+        "dois_broken": len(_DOI_BROKEN.findall(text)),
+    }
+
+
+def looks_degraded(pages: List[str]) -> bool:
+    """Poco texto por página, glifos sin mapear o DOIs partidos (`10.1234 /x`)."""
+    q = text_quality(pages)
+    if q["chars_per_page"] < _MIN_CHARS_PER_PAGE or q["bad_glyph_ratio"] > 0.01:
+        return True
+    return q["dois_broken"] > max(1, 0.1 * q["dois_ok"])
+
+
+def _score(pages: List[str]) -> Tuple[int, float]:
+    q = text_quality(pages)
+    return q["dois_ok"] - q["dois_broken"], q["chars_per_page"]
+
+
+def count_pages(source: PdfSource, backend: str = "auto") -> int:
+    return BACKENDS[_backend_name(backend)][0](source)
+
+
+def extract_page_range(
+    source: PdfSource, start: int = 0, end: Optional[int] = None, backend: str = "pdfplumber"
+) -> List[str]:
+    """Texto normalizado de las páginas `[start, end)`; cada worker abre el documento por su cuenta."""
+    pages = BACKENDS[_backend_name(backend)][1](source, start, end)
+    return [normalize_text(p) for p in pages]
+
+
+def _shards(start: int, end: int, workers: int) -> List[Tuple[int, int]]:
+    # ~2 tramos por worker para repartir mejor páginas de coste desigual
+    size = max(_MIN_SHARD_PAGES, -(-(end - start) // (2 * workers)))
+    return [(i, min(end, i + size)) for i in range(start, end, size)]
+
+
+def _run_sharded(
+    source: PdfSource, start: int, end: Optional[int], workers: int, threshold: int, backend: str
+) -> List[str]:
+    if workers == 1 or backend not in _SHARDED_BACKENDS:
+        return extract_page_range(source, start, end, backend)
+    total = count_pages(source, backend)
+    end = total if end is None else min(int(end), total)
+    if end - start < max(threshold, 2 * _MIN_SHARD_PAGES):
+        return extract_page_range(source, start, end, backend)
+
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        source = os.fspath(source)  # una ruta viaja como texto; los bytes se copian a cada tramo
+    else:
+        source = bytes(source)
+    pool = get_pdf_pool(workers)
+    futures = [pool.submit(extract_page_range, source, a, b, backend) for a, b in _shards(start, end, workers)]
+    pages: List[str] = []
+    for fut in futures:
+        pages.extend(fut.result())
+    return pages
+
+
+def extract_pages(
+    source: PdfSource,
+    start: int = 0,
+    end: Optional[int] = None,
+    backend: str = "auto",
+    workers: Optional[int] = None,
+    shard_threshold: Optional[int] = None,
+) -> Tuple[List[str], Dict[str, Any]]:
+    """Texto normalizado de las páginas `[start, end)` con el motor `backend`.
+
+    - `backend`: `"auto"` (motor rápido; pdfplumber si el texto parece degradado),
+      `"fast"`, o un nombre de `BACKENDS` (`pdfplumber`, `pypdf`, `pdfium`, `pymupdf`).
+    - Rangos de al menos `shard_threshold` páginas (por defecto
+      `PAGE_SHARD_THRESHOLD`) se reparten en tramos entre `workers` procesos;
+      el resultado conserva el orden de las páginas.
+
+    Returns: (páginas, info) con info = `{"backend", "pages", "seconds", "ms_per_page", "fallback"}`.
+    """
+    start = max(0, int(start))
+    n = max(1, int(workers or os.cpu_count() or 1))
+    threshold = PAGE_SHARD_THRESHOLD if shard_threshold is None else int(shard_threshold)
+    name = _backend_name(backend)
+
+    t0 = time.perf_counter()
+    pages = _run_sharded(source, start, end, n, threshold, name)
+    fallback = False
+    if backend == "auto" and name != "pdfplumber" and looks_degraded(pages):
+        retry = _run_sharded(source, start, end, n, threshold, "pdfplumber")
+        if _score(retry) >= _score(pages):
+            pages, name, fallback = retry, "pdfplumber", True
+    seconds = time.perf_counter() - t0
+    info = {
+        "backend": name,
+        "pages": len(pages),
+        "seconds": round(seconds, 3),
+        "ms_per_page": round(1000.0 * seconds / max(1, len(pages)), 1),
+        "fallback": fallback,
+    }
+    return pages, info
+
+
+def extract_pages_sharded(
+    source: PdfSource,
+    start: int = 0,
+    end: Optional[int] = None,
+    workers: Optional[int] = None,
+    shard_threshold: Optional[int] = None,
+    backend: str = "pdfplumber",
+) -> List[str]:
+    """Solo las páginas de `extract_pages` (por defecto con pdfplumber)."""
+    return extract_pages(source, start, end, backend, workers, shard_threshold)[0]
+
+
+def extract_text_pages(
+    pdf_file,
+    workers: Optional[int] = None,
+    shard_threshold: Optional[int] = None,
+    backend: str = "auto",
+) -> Tuple[List[str], str]:
+    """Texto por página. Acepta ruta, bytes o archivo abierto (p. ej. `UploadedFile`)."""
+    if hasattr(pdf_file, "read"):
+        if hasattr(pdf_file, "seek"):
+            pdf_file.seek(0)
+        pdf_file = pdf_file.read()
+    pages_text, info = extract_pages(pdf_file, backend=backend, workers=workers, shard_threshold=shard_threshold)
+    method = f"{info['backend']} ({info['ms_per_page']} ms/página)"
+    if info["fallback"]:
+        method += " [respaldo: texto del motor rápido degradado]"
     if len("".join(pages_text).strip()) < 120:
-        method = "pdfplumber (texto limitado; posible PDF escaneado)"
+        method += " (texto limitado; posible PDF escaneado)"
     return pages_text, method
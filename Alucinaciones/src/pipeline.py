@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .doi_extract import doi_key
+
+Result = Tuple[str, bool, str, int, str, float]
+
+_END = object()
+
+
+class _Stop(Exception):
+    pass
+
+
+def run_pipeline(
+    extracted: Iterable[Tuple[Any, List[Dict[str, Any]]]],
+    validate: Callable[[str], Result],
+    enrich: Optional[Callable[[List[str]], Dict[str, Tuple[Optional[str], Optional[str]]]]] = None,
+    validate_workers: int = 10,
+    enrich_batch: int = 20,
+    enrich_linger: float = 0.5,
+    queue_size: int = 256,
+    dedupe: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """Pipeline por etapas con colas acotadas: extracción → doi.org → Crossref.
+
+    - `extracted`: iterable (perezoso) de `(fuente, filas_doi)`; se consume en un
+      hilo propio, así que la extracción de la siguiente fuente se solapa con la
+      validación de la anterior.
+    - `validate(doi)`: devuelve el contrato `(doi, ok, category, status, message, time)`.
+    - `enrich(dois)`: opcional; recibe lotes de hasta `enrich_batch` DOIs (o los
+      que haya tras `enrich_linger` segundos) y devuelve `{doi_key: (title, source)}`.
+
+    Los DOIs se deduplican por `doi_key` (gana la primera aparición). Con
+    `dedupe=False` se valida cada fila de cada fuente (una fila por archivo y DOI;
+    `validate` debe tener su propia caché) y la memoria no crece con el corpus. Emite eventos:
+    - `{"type": "source", "source": s, "found": n, "new": m}`
+    - `{"type": "result", "info": fila, "result": tupla, "crossref": (title, source) | None}`
+    - `{"type": "error", "stage": ..., "source": s, "error": exc}`
+
+    Un error del iterable de fuentes se emite como evento y no detiene la
+    extracción de las demás: los iterables deben capturar los fallos por fuente
+    (como hace `process_pdfs_parallel`) para no cortar el resto.
+
+    Si el consumidor deja de iterar (o cierra el generador), las etapas se detienen.
+    """
+    workers = max(1, int(validate_workers))
+    stop = threading.Event()
+    q_validate: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    q_enrich: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    q_out: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    remaining = [workers]
+    remaining_lock = threading.Lock()
+
+    def put(q: "queue.Queue", item: Any) -> None:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _Stop()
+
+    def get(q: "queue.Queue", timeout: Optional[float] = None) -> Any:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not stop.is_set():
+            wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+            if wait <= 0:
+                raise queue.Empty()
+            try:
+                return q.get(timeout=wait)
+            except queue.Empty:
+                continue
+        raise _Stop()
+
+    def extract_stage() -> None:
+        seen = set()
+        try:
+            it = iter(extracted)
+            while not stop.is_set():
+                try:
+                    source, rows = next(it)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    # se sigue con la siguiente fuente si el iterable puede continuar
+                    # (un generador que lanzó ya terminó: el siguiente `next` da StopIteration)
+                    put(q_out, {"type": "error", "stage": "extract", "source": None, "error": e})
+                    continue
+                new = 0
+                for d in rows or []:
+                    k = doi_key(d.get("doi") or "")
+                    if not k or k in seen:
+                        continue
+                    if dedupe:
+                        seen.add(k)
+                    new += 1
+                    put(q_validate, d)
+                put(q_out, {"type": "source", "source": source, "found": len(rows or []), "new": new})
+            for _ in range(workers):
+                put(q_validate, _END)
+        except _Stop:
+            return
+
+    def validate_stage() -> None:
+        nxt = q_enrich if enrich is not None else q_out
+        try:
+            while True:
+                d = get(q_validate)
+                if d is _END:
+                    break
+                try:
+                    res = validate(d["doi"])
+                except Exception as e:
+                    res = (d["doi"], False, "unknown", 0, f"⚠️ Error: {type(e).__name__}: {str(e)[:80]}", 0.0)
+                item = {"type": "result", "info": d, "result": res, "crossref": None}
+                put(nxt, item)
+            with remaining_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                put(nxt, _END)
+        except _Stop:
+            return
+
+    def flush(batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            found = enrich([b["result"][0] for b in batch]) or {}
+        except Exception as e:
+            put(q_out, {"type": "error", "stage": "enrich", "source": None, "error": e})
+            found = {}
+        for b in batch:
+            b["crossref"] = found.get(doi_key(b["result"][0]), (None, None))
+            put(q_out, b)
+        batch.clear()
+
+    def enrich_stage() -> None:
+        batch: List[Dict[str, Any]] = []
+        try:
+            while True:
+                try:
+                    item = get(q_enrich, timeout=enrich_linger if batch else None)
+                except queue.Empty:
+                    flush(batch)
+                    continue
+                if item is _END:
+                    flush(batch)
+                    put(q_out, _END)
+                    return
+                batch.append(item)
+                if len(batch) >= max(1, int(enrich_batch)):
+                    flush(batch)
+        except _Stop:
+            return
+
+    threads = [threading.Thread(target=extract_stage, name="pipeline-extract", daemon=True)]
+    threads += [threading.Thread(target=validate_stage, name=f"pipeline-validate-{i}", daemon=True) for i in range(workers)]
+    if enrich is not None:
+        threads.append(threading.Thread(target=enrich_stage, name="pipeline-enrich", daemon=True))
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            ev = q_out.get()
+            if ev is _END:
+                break
+            yield ev
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=1.0)
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+from typing import Iterable, Optional, Set, Tuple
+
+import requests
+
+from .doi_extract import doi_prefix
+from .ratelimit import DOI_HOST, get_gate
+from .singleflight import SingleFlightCache
+
+KNOWN = "known"
+ABSENT = "absent"
+UNKNOWN = "unknown"
+
+
+def default_prefixes_path() -> str:
+    return os.environ.get("DOI_PREFIXES_PATH") or os.path.join(
+        os.path.expanduser("~"), ".cache", "doi_validator", "prefixes.json"
+    )
+
+
+class PrefixRegistry:
+    """Registro de prefijos de registrante (`10.xxxx`) existentes e inexistentes.
+
+    Se alimenta de resultados previos (`learn`), de listas masivas (`load`) y,
+    para prefijos nunca vistos, de una sola consulta por prefijo a
+    `https://doi.org/ra/{prefix}` (coalescida entre hilos). Un DOI con prefijo
+    inexistente se puede marcar inválido sin resolver su sufijo.
+    """
+
+    def __init__(self, known: Iterable[str] = (), absent: Iterable[str] = ()):
+        self._lock = threading.Lock()
+        self.known: Set[str] = {p.lower() for p in known}
+        self.absent: Set[str] = {p.lower() for p in absent}
+        self._probes = SingleFlightCache()
+        self.dirty = False
+
+    # -----------------------------------------------------
+    # Persistencia
+    # -----------------------------------------------------
+    @classmethod
+    def load(cls, path: str) -> "PrefixRegistry":
+        """Carga `{"known": [...], "absent": [...]}` o una lista de texto (un prefijo conocido por línea)."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as fh:
+            raw = fh.read()
+        try:
+            data = json.loads(raw)
+        except json.JSONDecodeError:
+            data = {"known": [ln.strip() for ln in raw.splitlines() if ln.strip().startswith("10.")]}
+        if isinstance(data, list):
+            data = {"known": data}
+        return cls(known=data.get("known") or [], absent=data.get("absent") or [])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            data = {"known": sorted(self.known), "absent": sorted(self.absent)}
+            self.dirty = False
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, path)
+
+    # -----------------------------------------------------
+    # Consulta / aprendizaje
+    # -----------------------------------------------------
+    def status(self, doi: str) -> str:
+        prefix = doi_prefix(doi)
+        if prefix is None:
+            return UNKNOWN
+        with self._lock:
+            if prefix in self.known:
+                return KNOWN
+            if prefix in self.absent:
+                return ABSENT
+        return UNKNOWN
+
+    def learn(self, doi: str, category: str) -> None:
+        """Un DOI que resuelve prueba que su prefijo existe (un 404 no prueba lo contrario)."""
+        prefix = doi_prefix(doi)
+        if prefix is None or category != "valid":
+            return
+        with self._lock:
+            if prefix not in self.known:
+                self.known.add(prefix)
+                self.absent.discard(prefix)
+                self.dirty = True
+
+    def learn_from_results(self, results: Iterable[Tuple]) -> None:
+        for res in results:
+            self.learn(res[0], res[2])
+
+    def _mark(self, prefix: str, exists: bool) -> None:
+        with self._lock:
+            (self.known if exists else self.absent).add(prefix)
+            self.dirty = True
+
+    def probe(self, doi: str, session: Optional[requests.Session] = None, timeout: float = 10.0) -> str:
+        """Estado del prefijo; si es desconocido, consulta doi.org/ra una vez por prefijo.
+        Errores de red devuelven UNKNOWN (no se descarta nada).
+        """
+        state = self.status(doi)
+        if state != UNKNOWN:
+            return state
+        prefix = doi_prefix(doi)
+        if prefix is None:
+            return UNKNOWN
+        state = self._probes.get_or_compute(prefix, lambda: self._probe_ra(prefix, session, timeout))
+        if state == UNKNOWN:
+            # un fallo transitorio no debe fijar el prefijo como desconocido para siempre
+            self._probes.pop(prefix, None)
+        return state
+
+    def _probe_ra(self, prefix: str, session: Optional[requests.Session], timeout: float) -> str:
+        http = session or requests
+        try:
+            r = get_gate(DOI_HOST).request(lambda: http.get(f"https://doi.org/ra/{prefix}", timeout=timeout))
+            if r.status_code != 200:
+                return UNKNOWN
+            data = r.json()
+        except Exception:
+            return UNKNOWN
+        entry = data[0] if isinstance(data, list) and data else {}
+        if entry.get("RA"):
+            self._mark(prefix, True)
+            return KNOWN
+        if "does not exist" in str(entry.get("status", "")).lower():
+            self._mark(prefix, False)
+            return ABSENT
+        return UNKNOWN
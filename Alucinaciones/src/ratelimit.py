@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+DOI_HOST = "doi.org"
+CROSSREF_HOST = "api.crossref.org"
+
+# (peticiones/segundo, ráfaga, concurrencia máxima) por host
+HOST_DEFAULTS: Dict[str, Tuple[float, int, int]] = {
+    DOI_HOST: (20.0, 20, 32),
+    CROSSREF_HOST: (10.0, 5, 8),
+}
+FALLBACK_DEFAULTS: Tuple[float, int, int] = (5.0, 5, 8)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Convierte un encabezado Retry-After (segundos o fecha HTTP) en segundos de espera."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket (formulado como GCRA) compartido por hilos y corutinas.
+
+    `reserve()` aparta un turno y devuelve cuántos segundos hay que esperar, de
+    modo que la espera ocurre fuera del lock. `pause()` bloquea a todo el host
+    (p. ej. por Retry-After).
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self._lock = threading.Lock()
+        self._interval = 1.0 / max(1e-6, float(rate))
+        self._tau = self._interval * (max(1, int(burst)) - 1)
+        self._tat = 0.0
+        self._paused_until = 0.0
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            t0 = max(now, self._paused_until)
+            go = max(t0, self._tat - self._tau)
+            self._tat = max(self._tat, go) + self._interval
+            return go - now
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, float(seconds)))
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class AIMDController:
+    """Límite de concurrencia adaptativo (additive increase / multiplicative decrease).
+
+    Sube ~1 slot por ventana completa de respuestas sanas y recorta el límite a
+    `decrease` cuando hay errores (429, 5xx, timeouts) o la latencia supera
+    `latency_factor` veces la línea base (EWMA). Como mucho un recorte por
+    ventana, para no colapsar ante una ráfaga de fallos simultáneos.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease: float = 0.5,
+        latency_factor: float = 2.5,
+    ):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.decrease = float(decrease)
+        self.latency_factor = float(latency_factor)
+        self._limit = float(min(max(int(initial), self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def set_max(self, max_limit: int) -> None:
+        with self._cond:
+            self.max_limit = max(self.min_limit, int(max_limit))
+            self._limit = min(self._limit, float(self.max_limit))
+            self._cond.notify_all()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    async def acquire_async(self, poll: float = 0.01) -> None:
+        while not self.try_acquire():
+            await asyncio.sleep(poll)
+
+    def release(self, ok: bool, latency: float) -> None:
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            slow = False
+            if ok and latency > 0:
+                if self._baseline is None:
+                    self._baseline = latency
+                else:
+                    slow = latency > self._baseline * self.latency_factor
+                    self._baseline = 0.9 * self._baseline + 0.1 * latency
+            now = time.monotonic()
+            if ok and not slow:
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / max(1.0, self._limit))
+            elif now - self._last_cut >= max(latency, 0.5):
+                self._limit = max(float(self.min_limit), self._limit * self.decrease)
+                self._last_cut = now
+            self._cond.notify_all()
+
+
+class HostGate:
+    """Limitador de tasa + control de concurrencia de un host, compartido por todos los workers."""
+
+    def __init__(self, host: str, rate: float, burst: int, max_concurrency: int):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.controller = AIMDController(initial=min(4, max_concurrency), max_limit=max_concurrency)
+
+    def acquire(self) -> None:
+        self.controller.acquire()
+        self.bucket.acquire()
+
+    async def acquire_async(self) -> None:
+        await self.controller.acquire_async()
+        await self.bucket.acquire_async()
+
+    def release(self, status: Optional[int], latency: float, retry_after: Optional[float] = None) -> bool:
+        """`status=None` indica timeout o error de conexión.
+        Returns: True si se aplicó el Retry-After (pausa de todo el host).
+        """
+        congested = status is None or status == 429 or status >= 500
+        paused = retry_after is not None and congested and status is not None
+        if paused:
+            self.bucket.pause(retry_after)
+        self.controller.release(ok=not congested, latency=latency)
+        return paused
+
+    def pause(self, seconds: float) -> None:
+        self.bucket.pause(seconds)
+
+    def request(self, send: Callable[[], "object"]):
+        """Ejecuta `send()` (que devuelve un `requests.Response`) respetando el gate."""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            r = send()
+        except Exception:
+            self.release(None, time.monotonic() - start)
+            raise
+        self.release(r.status_code, time.monotonic() - start, parse_retry_after(r.headers.get("Retry-After")))
+        return r
+
+
+_gates: Dict[str, HostGate] = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(host: str) -> HostGate:
+    """Gate único por host para todo el proceso."""
+    with _gates_lock:
+        gate = _gates.get(host)
+        if gate is None:
+            rate, burst, conc = HOST_DEFAULTS.get(host, FALLBACK_DEFAULTS)
+            gate = _gates[host] = HostGate(host, rate, burst, conc)
+        return gate
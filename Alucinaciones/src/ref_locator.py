@@ -0,0 +1,171 @@
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .pdf_extract import (
+    PdfReader,
+    PdfSource,
+    _as_stream,
+    _backend_name,
+    _fitz_open,
+    count_pages,
+    extract_page_range,
+    extract_pages,
+    fitz,
+    looks_degraded,
+)
+from .references import REF_END, REF_START
+
+# (nivel, título, índice de página 0-based)
+OutlineEntry = Tuple[int, str, int]
+
+_SCAN_STEP = 4
+
+# Numeración o prefijo de capítulo en los marcadores: "7 References", "VII. Bibliografía",
+# "Chapter 5: References", "Capítulo 4 - Referencias"…
+_OUTLINE_PREFIX = re.compile(
+    r"""
+^\s*
+(?:(?:chapter|cap[ií]tulo|section|secci[oó]n|part|parte)\s+)?
+(?:\d+(?:\.\d+)*|(?=[ivxlc])(?:x?c|x?l|l?x{0,3})(?:ix|iv|v?i{0,3}))
+(?:\s*[\.\):\-–—]\s*|\s+)
+""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def outline_entries(source: PdfSource) -> List[OutlineEntry]:
+    """Marcadores del PDF en orden de documento (vacío si no tiene o no se pueden leer)."""
+    try:
+        if fitz is not None:
+            with _fitz_open(source) as doc:
+                return [(lvl, title, page - 1) for lvl, title, page, *_ in doc.get_toc() if page > 0]
+        if PdfReader is not None:
+            reader = PdfReader(_as_stream(source))
+            out: List[OutlineEntry] = []
+
+            def walk(items, level: int) -> None:
+                for it in items:
+                    if isinstance(it, list):
+                        walk(it, level + 1)
+                        continue
+                    try:
+                        out.append((level, str(it.title), reader.get_destination_page_number(it)))
+                    except Exception:
+                        continue
+
+            walk(getattr(reader, "outline", None) or [], 1)
+            return out
+    except Exception:
+        pass
+    return []
+
+
+def locate_from_outline(entries: List[OutlineEntry], total: int) -> Optional[Tuple[int, int]]:
+    """Rango `[start, end)` del último marcador References/Bibliografía.
+    Termina en la página donde empieza la siguiente sección del mismo nivel o superior (incluida).
+    """
+    hit = None
+    for i, (level, title, page) in enumerate(entries):
+        title = (title or "").strip()
+        if REF_START.match(title) or REF_START.match(_OUTLINE_PREFIX.sub("", title, count=1)):
+            hit = i
+    if hit is None:
+        return None
+    level, _, start = entries[hit]
+    end = total
+    for lvl, _, page in entries[hit + 1 :]:
+        if lvl <= level and page >= start:
+            end = min(total, page + 1)
+            break
+    return start, end
+
+
+def _has_line(text: str, pattern) -> bool:
+    return any(pattern.match(ln.strip()) for ln in text.splitlines())
+
+
+def scan_for_references(
+    source: PdfSource, total: int, backend: str = "auto", max_scan_pages: int = 80
+) -> Tuple[Optional[int], int, Dict[int, str]]:
+    """Recorre el documento hacia atrás en bloques de páginas buscando el encabezado
+    `REF_START`. Al encontrarlo sigue retrocediendo mientras las páginas anteriores
+    también lo tengan (encabezado "References" repetido en cada página) y devuelve
+    la primera de esa serie; se detiene en la primera página sin él.
+    Un encabezado `REF_END` (anexos, agradecimientos…) visto antes acota el final.
+
+    Returns: (página de inicio o None, fin exclusivo, {página: texto} ya extraído)
+    """
+    seen: Dict[int, str] = {}
+    end = total
+    stop = max(0, total - int(max_scan_pages))
+    start: Optional[int] = None
+    hi = total
+    while hi > stop:
+        lo = max(stop, hi - _SCAN_STEP)
+        for offset, text in enumerate(extract_page_range(source, lo, hi, backend)):
+            seen[lo + offset] = text
+        for i in range(hi - 1, lo - 1, -1):
+            if _has_line(seen[i], REF_START):
+                start = i
+                continue
+            if start is not None:
+                return start, end, seen
+            if _has_line(seen[i], REF_END):
+                end = i + 1
+        hi = lo
+    return start, end, seen
+
+
+def extract_reference_pages(
+    source: PdfSource,
+    backend: str = "auto",
+    max_scan_pages: int = 80,
+    fallback_pages: int = 10,
+    workers: Optional[int] = None,
+    shard_threshold: Optional[int] = None,
+) -> Tuple[List[str], Dict[str, Any]]:
+    """Extrae solo las páginas de la bibliografía.
+
+    1. Marcadores del PDF (outline) con una entrada References/Bibliografía.
+    2. Si no hay, barrido hacia atrás página a página con el motor rápido
+       (las páginas ya leídas se reutilizan).
+    3. Si tampoco aparece el encabezado, las últimas `fallback_pages` páginas.
+
+    `workers` y `shard_threshold` se pasan a `extract_pages` en las extracciones de rango.
+
+    Returns: (páginas, info) con la info de `extract_pages` más `locator`
+    (`"outline"`, `"scan"` o `"tail"`) y `page_range` (`[start, end)`).
+    """
+    name = _backend_name(backend)
+    total = count_pages(source, name)
+    opts = dict(backend=backend, workers=workers, shard_threshold=shard_threshold)
+
+    located = locate_from_outline(outline_entries(source), total)
+    if located is not None:
+        pages, info = extract_pages(source, located[0], located[1], **opts)
+        info.update(locator="outline", page_range=located)
+        return pages, info
+
+    t0 = time.perf_counter()
+    start, end, seen = scan_for_references(source, total, name, max_scan_pages)
+    seconds = time.perf_counter() - t0
+    if start is None:
+        lo = max(0, total - int(fallback_pages))
+        pages, info = extract_pages(source, lo, total, **opts)
+        info.update(locator="tail", page_range=(lo, total))
+        return pages, info
+
+    pages = [seen[i] for i in range(start, end)]
+    info = {
+        "backend": name,
+        "pages": len(pages),
+        "seconds": round(seconds, 3),
+        # coste real: incluye las páginas leídas durante el barrido
+        "ms_per_page": round(1000.0 * seconds / max(1, len(seen)), 1),
+        "fallback": False,
+    }
+    if backend == "auto" and looks_degraded(pages):
+        pages, info = extract_pages(source, start, end, **opts)
+    info.update(locator="scan", page_range=(start, end))
+    return pages, info
@@ -1,5 +1,7 @@
 import re
-from typing import Optional, Tuple, List
+from bisect import bisect_left
+from typing import Optional, Tuple, List, Union
+from .doc_text import DocumentText
 from .pdf_extract import normalize_text
 
 REF_START = re.compile(
@@ -38,7 +40,14 @@ REF_END = re.compile(
 )
 
 
-def slice_references_section(full_text: str, min_lines_after: int = 12) -> Tuple[str, Optional[int], Optional[int]]:
+def slice_references_section(
+    full_text: Union[str, DocumentText], min_lines_after: int = 12
+) -> Tuple[Union[str, DocumentText], Optional[int], Optional[int]]:
+    """Sección de referencias + líneas de inicio y fin (None, None si no se detecta).
+    Con un `DocumentText` devuelve un recorte del mismo (conserva las páginas).
+    """
+    if isinstance(full_text, DocumentText):
+        return _slice_document(full_text, min_lines_after)
     lines = full_text.splitlines()
     start = None
     for i, line in enumerate(lines):
@@ -61,8 +70,85 @@ def slice_references_section(full_text: str, min_lines_after: int = 12) -> Tuple
     return ref_text, start, end
 
 
-def extract_reference_lines(ref_text: str) -> List[str]:
-    lines = [ln.strip() for ln in normalize_text(ref_text).splitlines()]
+def _slice_document(doc: DocumentText, min_lines_after: int) -> Tuple[DocumentText, Optional[int], Optional[int]]:
+    lines = doc.text.splitlines(keepends=True)
+    offsets = [0]
+    for ln in lines:
+        offsets.append(offsets[-1] + len(ln))
+    start = None
+    for i, line in enumerate(lines):
+        if REF_START.match(line.strip()):
+            start = i
+            break
+    if start is None:
+        return doc, None, None
+
+    end = len(lines)
+    for j in range(start + 1, len(lines)):
+        if REF_END.match(lines[j].strip()):
+            if (j - start) >= min_lines_after:
+                end = j
+                break
+
+    lo, hi = offsets[start], offsets[end]
+    raw = doc.text[lo:hi]
+    ref_len = len(raw.strip())
+    if ref_len < 250:
+        return doc, None, None
+    lo += len(raw) - len(raw.lstrip())
+    return doc.slice(lo, lo + ref_len), start, end
+
+
+_SPACES = re.compile(r"\s+")
+
+
+class ReferenceLineIndex:
+    """Índice de las líneas de referencia de un documento para encontrar la línea de un DOI.
+
+    Cada línea se normaliza una vez (minúsculas, sin espacios) y se guardan, ordenados,
+    los sufijos que empiezan en cada "10." de la línea. Un DOI (que siempre empieza por
+    "10.") está contenido en una línea si y solo si es prefijo de uno de esos sufijos:
+    se resuelve con una búsqueda binaria en lugar de recorrer todas las líneas.
+    Mismo resultado que la búsqueda lineal: la primera línea que contiene el DOI.
+    """
+
+    def __init__(self, reference_lines: List[str]):
+        self.lines = list(reference_lines or [])
+        self._norm = [_SPACES.sub("", (ln or "").lower()) for ln in self.lines]
+        tails: List[Tuple[str, int]] = []
+        for i, norm in enumerate(self._norm):
+            pos = norm.find("10.")
+            while pos >= 0:
+                tails.append((norm[pos:], i))
+                pos = norm.find("10.", pos + 1)
+        tails.sort()
+        self._tails = tails
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def find(self, doi: str) -> Optional[str]:
+        key = _SPACES.sub("", (doi or "").lower())
+        if not key:
+            return None
+        if not key.startswith("10."):
+            # fuera del índice: búsqueda lineal
+            for ln, norm in zip(self.lines, self._norm):
+                if key in norm:
+                    return ln
+            return None
+        best = None
+        i = bisect_left(self._tails, (key,))
+        while i < len(self._tails) and self._tails[i][0].startswith(key):
+            line = self._tails[i][1]
+            best = line if best is None else min(best, line)
+            i += 1
+        return None if best is None else self.lines[best]
+
+
+def extract_reference_lines(ref_text: Union[str, DocumentText]) -> List[str]:
+    text = ref_text.text if isinstance(ref_text, DocumentText) else normalize_text(ref_text)
+    lines = [ln.strip() for ln in text.splitlines()]
     lines = [ln for ln in lines if len(ln) >= 35]
     lines = [ln for ln in lines if not REF_START.match(ln)]
     return lines
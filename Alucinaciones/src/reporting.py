@@ -1,20 +1,53 @@
+import csv
+import io
+import json
 from datetime import datetime
-from typing import List, Dict
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence, TextIO, Union
+
+import numpy as np
 import pandas as pd
 
+# Parquet (opcional)
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except Exception:  # pragma: no cover
+    pa = None
+    pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+SORT_COLUMNS = ["Categoría", "Código HTTP", "DOI"]
+
+# Las categorías llegan en inglés (validador) o ya refinadas en español (app)
+_VALID = ("valid", "válido")
+_INVALID = ("invalid", "inválido")
+_UNKNOWN = ("unknown", "desconocido")
+
+
+def _sort_key(col: pd.Series) -> pd.Series:
+    # "Código HTTP" mezcla enteros y "N/A": orden numérico con los no numéricos al final
+    if col.name == "Código HTTP":
+        return pd.to_numeric(col, errors="coerce")
+    if col.name == "Categoría":
+        return col.astype("category")
+    return col.astype(str)
+
 
 def to_dataframe(rows: List[Dict]) -> pd.DataFrame:
     df = pd.DataFrame(rows)
-    if not df.empty:
-        df.sort_values(by=["Categoría", "Código HTTP", "DOI"], inplace=True, ignore_index=True)
-    return df
+    by = [c for c in SORT_COLUMNS if c in df.columns]
+    if df.empty or not by:
+        return df
+    return df.sort_values(by=by, key=_sort_key, kind="stable", ignore_index=True)
 
 
 def make_txt_report(df: pd.DataFrame) -> str:
     total = len(df)
-    valid_count = int((df["Categoría"] == "valid").sum()) if total else 0
-    invalid_count = int((df["Categoría"] == "invalid").sum()) if total else 0
-    unknown_count = int((df["Categoría"] == "unknown").sum()) if total else 0
+    cat = df["Categoría"] if total else pd.Series(dtype=object)
+    valid_count = int(cat.isin(_VALID).sum())
+    invalid_count = int(cat.isin(_INVALID).sum())
+    unknown_count = int(cat.isin(_UNKNOWN).sum())
 
     lines = [
         "REPORTE DE VALIDACIÓN DE DOIs",
@@ -28,9 +61,206 @@ def make_txt_report(df: pd.DataFrame) -> str:
         "",
         "-" * 72,
     ]
-    for _, r in df.iterrows():
-        extra = ""
-        if "Título (Crossref)" in df.columns and str(r.get("Título (Crossref)", "")).strip():
-            extra = f" | Título: {r.get('Título (Crossref)')}"
-        lines.append(f"{r['Estado']} | {r['DOI']} | HTTP={r['Código HTTP']} | {r['Mensaje']}{extra}")
+    if total:
+        # una línea por fila con operaciones de columna (sin iterrows)
+        body = (
+            df["Estado"].astype(str)
+            + " | "
+            + df["DOI"].astype(str)
+            + " | HTTP="
+            + df["Código HTTP"].astype(str)
+            + " | "
+            + df["Mensaje"].astype(str)
+        )
+        if "Título (Crossref)" in df.columns:
+            title = df["Título (Crossref)"].fillna("").astype(str)
+            body = body + np.where(title.str.strip() != "", " | Título: " + title, "")
+        lines.extend(body.tolist())
     return "\n".join(lines)
+
+
+# =========================================================
+# Exportación por bloques (sin un DataFrame gigante en memoria)
+# =========================================================
+class ChunkedWriter:
+    """Escritor en streaming: acumula filas (dicts) y escribe cada `chunk_size`.
+    `columns` fija columnas y orden; si no se da, se toman de la primera fila.
+    Acepta una ruta o un archivo ya abierto (que no se cierra al terminar).
+    """
+
+    binary = False
+
+    def __init__(self, target: Union[str, TextIO, BinaryIO], columns: Optional[Sequence[str]] = None, chunk_size: int = 5000):
+        self.columns: Optional[List[str]] = list(columns) if columns else None
+        self.chunk_size = max(1, int(chunk_size))
+        self.rows_written = 0
+        self._buf: List[Dict[str, Any]] = []
+        if isinstance(target, str):
+            mode = "wb" if self.binary else "w"
+            self._fh = open(target, mode) if self.binary else open(target, mode, encoding="utf-8", newline="")
+            self._owns = True
+        else:
+            self._fh = target
+            self._owns = False
+
+    def write(self, row: Dict[str, Any]) -> None:
+        if self.columns is None:
+            self.columns = list(row)
+        self._buf.append(row)
+        if len(self._buf) >= self.chunk_size:
+            self.flush()
+
+    def write_many(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.write(row)
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        """Un DataFrame ya construido, por bloques de `chunk_size` filas."""
+        if self.columns is None:
+            self.columns = [str(c) for c in df.columns]
+        self.flush()
+        for start in range(0, len(df), self.chunk_size):
+            self._write_chunk(df.iloc[start : start + self.chunk_size].to_dict("records"))
+
+    def flush(self) -> None:
+        if self._buf:
+            self._write_chunk(self._buf)
+            self._buf = []
+
+    def _write_chunk(self, rows: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        self.flush()
+        self._close()
+        if self._owns:
+            self._fh.close()
+        else:
+            self._fh.flush()
+
+    def _close(self) -> None:
+        pass
+
+    def __enter__(self) -> "ChunkedWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CsvChunkWriter(ChunkedWriter):
+    def _write_chunk(self, rows: List[Dict[str, Any]]) -> None:
+        if not hasattr(self, "_csv"):
+            self._csv = csv.DictWriter(self._fh, fieldnames=self.columns, extrasaction="ignore")
+            self._csv.writeheader()
+        self._csv.writerows(rows)
+        self.rows_written += len(rows)
+
+
+def _json_default(x: Any) -> Any:
+    if isinstance(x, np.generic):
+        return x.item()
+    return str(x)
+
+
+class JsonlChunkWriter(ChunkedWriter):
+    def _write_chunk(self, rows: List[Dict[str, Any]]) -> None:
+        cols = self.columns
+        self._fh.write(
+            "".join(
+                json.dumps({c: r.get(c) for c in cols}, ensure_ascii=False, default=_json_default) + "\n"
+                for r in rows
+            )
+        )
+        self.rows_written += len(rows)
+
+
+class ParquetChunkWriter(ChunkedWriter):
+    """Un grupo de filas Parquet por bloque; el esquema queda fijo para todo el archivo.
+    Para columnas tipadas en streaming (`write` / `write_many`) hay que pasar `schema`:
+    sin él, todas las columnas se escriben como texto, porque un bloque posterior
+    puede traer otro tipo (p. ej. "Código HTTP": 200 y luego "N/A"). `write_frame`
+    sí infiere tipos, a partir de todas las filas del DataFrame."""
+
+    binary = True
+
+    def __init__(self, target, columns=None, chunk_size: int = 50_000, schema=None):
+        if pa is None:
+            raise RuntimeError("La salida Parquet requiere pyarrow (pip install pyarrow)")
+        super().__init__(target, columns, chunk_size)
+        self.schema = schema
+        self._writer = None
+
+    def _infer_schema(self, columns: Dict[str, Sequence[Any]]):
+        # columnas mixtas (p. ej. "Código HTTP": 200 / "N/A") o vacías → texto
+        fields = []
+        for c in self.columns:
+            values = list(columns[c])
+            if any(isinstance(v, str) for v in values):
+                kind = pa.string()
+            else:
+                try:
+                    kind = pa.array(values, from_pandas=True).type
+                except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+                    kind = pa.string()
+            fields.append((c, pa.string() if pa.types.is_null(kind) else kind))
+        return pa.schema(fields)
+
+    def _write_chunk(self, rows: List[Dict[str, Any]]) -> None:
+        if self.schema is None:
+            self.schema = pa.schema([(c, pa.string()) for c in self.columns])
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._fh, self.schema)
+        arrays = []
+        for field in self.schema:
+            values = [r.get(field.name) for r in rows]
+            if pa.types.is_string(field.type):
+                values = [v if v is None or isinstance(v, str) or pd.isna(v) else str(v) for v in values]
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows_written += len(rows)
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        # con el DataFrame completo a mano, el esquema sale de todas las filas
+        if self.schema is None and len(df):
+            if self.columns is None:
+                self.columns = [str(c) for c in df.columns]
+            self.schema = self._infer_schema({str(c): df[c].tolist() for c in df.columns})
+        super().write_frame(df)
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+WRITERS = {"csv": CsvChunkWriter, "jsonl": JsonlChunkWriter, "parquet": ParquetChunkWriter}
+
+
+def export_format(path: str) -> str:
+    low = path.lower()
+    if low.endswith((".parquet", ".pq")):
+        return "parquet"
+    if low.endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+def open_chunk_writer(target, fmt: Optional[str] = None, **kwargs: Any) -> ChunkedWriter:
+    """`fmt`: "csv", "jsonl" o "parquet" (por defecto, según la extensión de `target`)."""
+    fmt = fmt or (export_format(target) if isinstance(target, str) else "jsonl")
+    if fmt not in WRITERS:
+        raise ValueError(f"Formato de exportación desconocido: {fmt!r}")
+    return WRITERS[fmt](target, **kwargs)
+
+
+def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    """DataFrame → bytes del formato pedido, escrito por bloques (para descargas)."""
+    if fmt == "parquet":
+        buf = io.BytesIO()
+        with ParquetChunkWriter(buf) as w:
+            w.write_frame(df)
+        return buf.getvalue()
+    text = io.StringIO()
+    with open_chunk_writer(text, fmt) as w:
+        w.write_frame(df)
+    return text.getvalue().encode("utf-8")
@@ -0,0 +1,333 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .doi_extract import doi_key
+from .prefixes import ABSENT, PrefixRegistry
+from .ratelimit import DOI_HOST, HostGate, get_gate, parse_retry_after
+from .singleflight import SingleFlightCache
+
+# Optional async HTTP client
+try:
+    import aiohttp  # type: ignore
+except Exception:  # pragma: no cover
+    aiohttp = None
+
+Result = Tuple[str, bool, str, int, str, float]
+
+DOI_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (DOI Validator)",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.7,es;q=0.5",
+}
+
+PREFIX_ABSENT_MSG = "✗ Prefijo DOI no registrado"
+
+
+def _status_verdict(status: int, last: bool) -> Tuple[Optional[Tuple[bool, str, str]], float]:
+    """Interpreta un código HTTP.
+    Returns: (veredicto (ok, category, message) o None si hay que reintentar, base de backoff)
+    """
+    if 200 <= status < 400:
+        return (True, "valid", f"✓ Resuelve (HTTP {status})"), 0.0
+    if status in (400, 404):
+        msg = "✗ DOI no encontrado" if status == 404 else "✗ Bad Request (posible DOI/formato inválido)"
+        return (False, "invalid", msg), 0.0
+    if status == 429:
+        return ((False, "unknown", "⚠️ Rate limit (HTTP 429)") if last else None), 1.0
+    if 500 <= status < 600:
+        return ((False, "unknown", f"⚠️ Error servidor (HTTP {status})") if last else None), 0.8
+    return ((False, "unknown", f"⚠️ Respuesta no concluyente (HTTP {status})") if last else None), 0.6
+
+
+def _error_verdict(kind: str, exc: Optional[BaseException], last: bool) -> Tuple[Optional[Tuple[bool, str, str]], float]:
+    if kind == "timeout":
+        return ((False, "unknown", "⚠️ Timeout") if last else None), 1.0
+    if kind == "connection":
+        return ((False, "unknown", "⚠️ Error de conexión") if last else None), 1.0
+    msg = f"⚠️ Error: {type(exc).__name__}: {str(exc)[:80]}"
+    return ((False, "unknown", msg) if last else None), 0.6
+
+
+def _error_kind(exc: BaseException) -> str:
+    if isinstance(exc, (requests.exceptions.Timeout, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return "connection"
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientConnectionError):
+        return "connection"
+    return "other"
+
+
+def _backoff(gate: HostGate, status: int, paused: bool, attempt: int, base: float) -> float:
+    """Decide la espera antes de reintentar.
+    Un 429 (o un Retry-After que el gate aplicó, `paused`) pausa al host completo
+    vía el gate compartido, así que el reintento solo espera su turno; el resto
+    (incluido un Retry-After en un 403 u otro 4xx) usa backoff local.
+    Returns: segundos de espera local.
+    """
+    delay = (2 ** attempt) * base
+    if paused:
+        return 0.0
+    if status == 429:
+        gate.pause(delay)
+        return 0.0
+    return delay
+
+
+def _needs_get(status: int) -> bool:
+    return status in (405, 403) or status >= 500
+
+
+class DOIResolver:
+    """Motor de resolución contra doi.org con conexiones keep-alive reutilizadas.
+
+    Una sola `requests.Session` (con pool por host) se comparte entre todos los
+    hilos; el modo asyncio usa `aiohttp` si está instalado. Todas las variantes
+    devuelven el contrato `(doi, ok, category, status, message, time)`.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 15.0,
+        max_retries: int = 2,
+        pool_size: int = 32,
+        gate: Optional[HostGate] = None,
+        prefixes: Optional[PrefixRegistry] = None,
+    ):
+        self.timeout = float(timeout)
+        self.max_retries = int(max_retries)
+        self.pool_size = int(pool_size)
+        # rate limit + concurrencia AIMD compartidos con cualquier otro resolver del proceso
+        self.gate = gate or get_gate(DOI_HOST)
+        # prefijos de registrante: corta DOIs con prefijo inexistente antes de resolver el sufijo
+        self.prefixes = prefixes
+        # pool_connections: hosts distintos en caché (doi.org + editoriales tras redirección)
+        adapter = HTTPAdapter(pool_connections=64, pool_maxsize=self.pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.headers.update(DOI_HEADERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # -----------------------------------------------------
+    # Cache (mismo formato que validate_doi_http)
+    # -----------------------------------------------------
+    @staticmethod
+    def _entry(ok: bool, cat: str, status: int, msg: str, start: float) -> Dict:
+        return {"ok": ok, "category": cat, "status": status, "message": msg, "time": time.time() - start}
+
+    @staticmethod
+    def _as_result(doi: str, c: Dict) -> Result:
+        return doi, c["ok"], c["category"], c["status"], c["message"], c["time"]
+
+    def _attempts(self, max_retries: Optional[int]) -> int:
+        return max(1, int(self.max_retries if max_retries is None else max_retries))
+
+    # -----------------------------------------------------
+    # Modo hilos
+    # -----------------------------------------------------
+    def _status(self, url: str, timeout: float) -> Tuple[int, Optional[float]]:
+        r = self.session.head(url, allow_redirects=True, timeout=timeout)
+        r.close()
+        if _needs_get(r.status_code):
+            with self.session.get(url, allow_redirects=True, timeout=timeout, stream=True) as g:
+                return g.status_code, parse_retry_after(g.headers.get("Retry-After"))
+        return r.status_code, parse_retry_after(r.headers.get("Retry-After"))
+
+    def validate(
+        self,
+        doi: str,
+        cache: Optional[Dict[str, Dict]] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ) -> Result:
+        """Con un `SingleFlightCache`, las consultas concurrentes del mismo DOI
+        normalizado esperan a una única petición en vuelo."""
+        key = doi_key(doi)
+        if isinstance(cache, SingleFlightCache):
+            entry = cache.get_or_compute(key, lambda: self._resolve(doi, timeout, max_retries))
+        elif cache is not None and key in cache:
+            entry = cache[key]
+        else:
+            entry = self._resolve(doi, timeout, max_retries)
+            if cache is not None:
+                cache[key] = entry
+        return self._as_result(doi, entry)
+
+    def _resolve(self, doi: str, timeout: Optional[float], max_retries: Optional[int]) -> Dict:
+        url = f"https://doi.org/{doi}"
+        timeout = self.timeout if timeout is None else float(timeout)
+        attempts = self._attempts(max_retries)
+        start = time.time()
+
+        if self.prefixes is not None:
+            if self.prefixes.probe(doi, session=self.session, timeout=timeout) == ABSENT:
+                return self._entry(False, "invalid", 0, PREFIX_ABSENT_MSG, start)
+            entry = self._resolve_suffix(url, timeout, attempts, start)
+            self.prefixes.learn(doi, entry["category"])
+            return entry
+        return self._resolve_suffix(url, timeout, attempts, start)
+
+    def _resolve_suffix(self, url: str, timeout: float, attempts: int, start: float) -> Dict:
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            status, paused = 0, False
+            self.gate.acquire()
+            t = time.monotonic()
+            try:
+                status, retry_after = self._status(url, timeout)
+            except Exception as e:
+                self.gate.release(None, time.monotonic() - t)
+                verdict, base = _error_verdict(_error_kind(e), e, last)
+            else:
+                paused = self.gate.release(status, time.monotonic() - t, retry_after)
+                verdict, base = _status_verdict(status, last)
+            if verdict is not None:
+                return self._entry(verdict[0], verdict[1], status, verdict[2], start)
+            delay = _backoff(self.gate, status, paused, attempt, base)
+            if delay > 0:
+                time.sleep(delay)
+
+        return self._entry(False, "unknown", 0, "⚠️ Máximo de reintentos alcanzado", start)
+
+    def validate_many(
+        self,
+        dois: Iterable[str],
+        workers: int = 10,
+        cache: Optional[Dict[str, Dict]] = None,
+    ) -> Iterator[Result]:
+        """Valida en un pool de hilos y entrega resultados a medida que terminan."""
+        with ThreadPoolExecutor(max_workers=max(1, int(workers))) as ex:
+            futs = [ex.submit(self.validate, d, cache) for d in dois]
+            for fut in as_completed(futs):
+                yield fut.result()
+
+    # -----------------------------------------------------
+    # Modo asyncio
+    # -----------------------------------------------------
+    async def _astatus(self, session, url: str, timeout: float) -> Tuple[int, Optional[float]]:
+        to = aiohttp.ClientTimeout(total=timeout)
+        async with session.head(url, allow_redirects=True, timeout=to) as r:
+            status, retry_after = r.status, r.headers.get("Retry-After")
+        if _needs_get(status):
+            async with session.get(url, allow_redirects=True, timeout=to) as g:
+                status, retry_after = g.status, g.headers.get("Retry-After")
+        return status, parse_retry_after(retry_after)
+
+    async def _avalidate(self, session, doi: str, cache: Optional[Dict[str, Dict]]) -> Result:
+        key = doi_key(doi)
+        if isinstance(cache, SingleFlightCache):
+            entry = await cache.aget_or_compute(key, lambda: self._aresolve(session, doi))
+        elif cache is not None and key in cache:
+            entry = cache[key]
+        else:
+            entry = await self._aresolve(session, doi)
+            if cache is not None:
+                cache[key] = entry
+        return self._as_result(doi, entry)
+
+    async def _aresolve(self, session, doi: str) -> Dict:
+        url = f"https://doi.org/{doi}"
+        attempts = self._attempts(None)
+        start = time.time()
+        # en modo async solo se usa lo ya conocido (sin sondeo bloqueante a doi.org/ra)
+        if self.prefixes is not None:
+            if self.prefixes.status(doi) == ABSENT:
+                return self._entry(False, "invalid", 0, PREFIX_ABSENT_MSG, start)
+            entry = await self._aresolve_suffix(session, url, attempts, start)
+            self.prefixes.learn(doi, entry["category"])
+            return entry
+        return await self._aresolve_suffix(session, url, attempts, start)
+
+    async def _aresolve_suffix(self, session, url: str, attempts: int, start: float) -> Dict:
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            status, paused = 0, False
+            await self.gate.acquire_async()
+            t = time.monotonic()
+            try:
+                status, retry_after = await self._astatus(session, url, self.timeout)
+            except Exception as e:
+                self.gate.release(None, time.monotonic() - t)
+                verdict, base = _error_verdict(_error_kind(e), e, last)
+            else:
+                paused = self.gate.release(status, time.monotonic() - t, retry_after)
+                verdict, base = _status_verdict(status, last)
+            if verdict is not None:
+                return self._entry(verdict[0], verdict[1], status, verdict[2], start)
+            delay = _backoff(self.gate, status, paused, attempt, base)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        return self._entry(False, "unknown", 0, "⚠️ Máximo de reintentos alcanzado", start)
+
+    async def avalidate_many(
+        self,
+        dois: Iterable[str],
+        concurrency: int = 200,
+        cache: Optional[Dict[str, Dict]] = None,
+    ) -> AsyncIterator[Result]:
+        """Mantiene hasta `concurrency` validaciones en vuelo; entrega en orden de llegada.
+        Sin aiohttp, recurre al modo hilos desde el event loop.
+        """
+        dois = list(dois)
+        concurrency = max(1, int(concurrency))
+        loop = asyncio.get_running_loop()
+
+        if aiohttp is None:
+            with ThreadPoolExecutor(max_workers=min(concurrency, max(1, len(dois)))) as ex:
+                tasks = [loop.run_in_executor(ex, self.validate, d, cache) for d in dois]
+                for fut in asyncio.as_completed(tasks):
+                    yield await fut
+            return
+
+        sem = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(headers=DOI_HEADERS, connector=connector) as session:
+
+            async def one(d: str) -> Result:
+                async with sem:
+                    return await self._avalidate(session, d, cache)
+
+            for fut in asyncio.as_completed([one(d) for d in dois]):
+                yield await fut
+
+    def validate_many_async(
+        self,
+        dois: Iterable[str],
+        concurrency: int = 200,
+        cache: Optional[Dict[str, Dict]] = None,
+    ) -> List[Result]:
+        """Punto de entrada síncrono para el modo asyncio (no usar dentro de un loop activo)."""
+
+        async def collect() -> List[Result]:
+            return [r async for r in self.avalidate_many(dois, concurrency=concurrency, cache=cache)]
+
+        return asyncio.run(collect())
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "DOIResolver":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_default_resolver: Optional[DOIResolver] = None
+_default_lock = threading.Lock()
+
+
+def get_default_resolver() -> DOIResolver:
+    """Resolver compartido por el proceso (un único pool de conexiones)."""
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            _default_resolver = DOIResolver()
+        return _default_resolver
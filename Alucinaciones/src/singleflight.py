@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from collections.abc import MutableMapping
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+
+class SingleFlightCache(MutableMapping):
+    """Caché thread-safe y async-safe que coalesce peticiones en vuelo.
+
+    Se comporta como un `dict` (compatible con el `cache` de
+    `validate_doi_http`), y además `get_or_compute` / `aget_or_compute`
+    garantizan que, para una misma clave, solo una llamada ejecute la
+    consulta: las concurrentes esperan su resultado en lugar de duplicarla.
+    Los futures son de `concurrent.futures`, así que hilos y corutinas (de
+    cualquier event loop) pueden esperar a la misma petición.
+    Con `max_size`, al superar el límite se descartan las entradas más antiguas
+    (para procesos largos en los que la memoria no debe crecer con el corpus).
+    """
+
+    def __init__(self, initial: Optional[Dict[str, Any]] = None, max_size: Optional[int] = None):
+        self._lock = threading.Lock()
+        self.max_size = None if max_size is None else max(1, int(max_size))
+        self._data: Dict[str, Any] = dict(initial or {})
+        self._inflight: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    # -----------------------------------------------------
+    # Interfaz dict
+    # -----------------------------------------------------
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            return self._data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._trim()
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.get(key, default)
+
+    def _trim(self) -> None:
+        # bajo `self._lock`; los dict conservan el orden de inserción
+        if self.max_size is not None:
+            while len(self._data) > self.max_size:
+                del self._data[next(iter(self._data))]
+
+    # -----------------------------------------------------
+    # Single-flight
+    # -----------------------------------------------------
+    def _claim(self, key: str):
+        """Returns: (valor_en_cache, future, es_líder)"""
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                return self._data[key], None, False
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return None, fut, False
+            fut = Future()
+            self._inflight[key] = fut
+            self.misses += 1
+            return None, fut, True
+
+    def _settle(self, key: str, fut: Future, value: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if error is None:
+                self._data[key] = value
+                self._trim()
+            self._inflight.pop(key, None)
+        if error is None:
+            fut.set_result(value)
+        else:
+            fut.set_exception(error)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        value, fut, leader = self._claim(key)
+        if fut is None:
+            return value
+        if not leader:
+            return fut.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            self._settle(key, fut, error=e)
+            raise
+        self._settle(key, fut, value)
+        return value
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value, fut, leader = self._claim(key)
+        if fut is None:
+            return value
+        if not leader:
+            return await asyncio.wrap_future(fut)
+        try:
+            value = await compute()
+        except BaseException as e:
+            self._settle(key, fut, error=e)
+            raise
+        self._settle(key, fut, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "in_flight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,213 @@
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .doi_extract import doi_key
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS works (
+    key TEXT PRIMARY KEY,
+    title TEXT,
+    container TEXT,
+    publisher TEXT,
+    authors TEXT,
+    year INTEGER
+) WITHOUT ROWID;
+"""
+
+_CHUNK = 500
+
+
+def default_snapshot_path() -> Optional[str]:
+    return os.environ.get("CROSSREF_SNAPSHOT_PATH") or None
+
+
+def _first(v: Any) -> Optional[str]:
+    if isinstance(v, list):
+        v = v[0] if v else None
+    return v.strip() if isinstance(v, str) and v.strip() else None
+
+
+def _year(item: Dict[str, Any]) -> Optional[int]:
+    for field in ("issued", "published-print", "published-online", "published", "created"):
+        parts = ((item.get(field) or {}).get("date-parts") or [[None]])[0] or [None]
+        if parts and isinstance(parts[0], int):
+            return parts[0]
+    return None
+
+
+def _authors(item: Dict[str, Any]) -> List[str]:
+    out = []
+    for a in item.get("author") or []:
+        name = " ".join(p for p in (a.get("given"), a.get("family")) if p) or a.get("name")
+        if name:
+            out.append(name)
+    return out
+
+
+def compact_record(item: Dict[str, Any]) -> Optional[Tuple]:
+    """Reduce un registro Crossref a (key, title, container, publisher, authors_json, year)."""
+    key = doi_key(item.get("DOI") or "")
+    if not key:
+        return None
+    authors = _authors(item)
+    return (
+        key,
+        _first(item.get("title")),
+        _first(item.get("container-title")),
+        _first(item.get("publisher")),
+        json.dumps(authors, ensure_ascii=False) if authors else None,
+        _year(item),
+    )
+
+
+def _items(obj: Dict[str, Any]) -> List[Dict[str, Any]]:
+    message = obj.get("message")
+    if isinstance(message, dict):
+        obj = message
+    items = obj.get("items")
+    return items if isinstance(items, list) else [obj]
+
+
+def iter_dump_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Registros de un volcado estilo Crossref public data file.
+    Acepta JSONL (un registro por línea) o documentos `{"items": [...]}`, con o sin gzip.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        first = True
+        while True:
+            ln = fh.readline()
+            if not ln:
+                break
+            ln = ln.strip()
+            if not ln:
+                continue
+            try:
+                obj = json.loads(ln)
+            except json.JSONDecodeError:
+                if first:
+                    # un único documento JSON multilínea
+                    fh.seek(0)
+                    yield from _items(json.load(fh))
+                    return
+                continue
+            first = False
+            yield from _items(obj)
+
+
+def _as_item(row: Tuple) -> Dict[str, Any]:
+    """Registro compacto → forma de item Crossref (compatible con el resto de `metadata.py`)."""
+    key, title, container, publisher, authors, year = row
+    item: Dict[str, Any] = {"DOI": key, "title": [title] if title else [], "publisher": publisher}
+    item["container-title"] = [container] if container else []
+    item["author"] = [{"name": a} for a in json.loads(authors)] if authors else []
+    if year:
+        item["issued"] = {"date-parts": [[year]]}
+    return item
+
+
+class CrossrefSnapshot:
+    """Almacén local de metadatos Crossref (SQLite, tabla WITHOUT ROWID + mmap).
+
+    Solo guarda título, container-title, editorial, autores y año por DOI.
+    Las lecturas usan una conexión por hilo y no tocan la red.
+    """
+
+    def __init__(self, path: str, mmap_bytes: int = 1 << 30):
+        self.path = path
+        self.mmap_bytes = int(mmap_bytes)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+            self._local.conn = conn
+        return conn
+
+    # -----------------------------------------------------
+    # Ingesta
+    # -----------------------------------------------------
+    def ingest(self, paths: Iterable[str], batch_size: int = 10000) -> int:
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        total = 0
+        batch: List[Tuple] = []
+
+        def flush() -> None:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO works VALUES (?,?,?,?,?,?)", batch)
+            batch.clear()
+
+        for path in paths:
+            for item in iter_dump_records(path):
+                row = compact_record(item)
+                if row is None:
+                    continue
+                batch.append(row)
+                total += 1
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return total
+
+    # -----------------------------------------------------
+    # Consultas
+    # -----------------------------------------------------
+    def get(self, doi: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM works WHERE key = ?", (doi_key(doi),)).fetchone()
+        return _as_item(row) if row else None
+
+    def get_many(self, dois: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Returns: {doi_key: item} solo para los DOIs presentes en el snapshot."""
+        keys = list(dict.fromkeys(k for k in (doi_key(d) for d in dois) if k))
+        out: Dict[str, Dict[str, Any]] = {}
+        conn = self._conn()
+        for i in range(0, len(keys), _CHUNK):
+            chunk = keys[i : i + _CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for row in conn.execute(f"SELECT * FROM works WHERE key IN ({marks})", chunk):
+                out[row[0]] = _as_item(row)
+        return out
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM works").fetchone()[0]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Ingesta un volcado Crossref (JSONL[.gz]) en un snapshot local.")
+    ap.add_argument("dumps", nargs="+", help="Archivos .jsonl / .jsonl.gz / .json.gz")
+    ap.add_argument("--db", default=default_snapshot_path(), required=default_snapshot_path() is None)
+    ap.add_argument("--index", action="store_true", help="Construir también el índice de búsqueda bibliográfica (FTS5)")
+    args = ap.parse_args(argv)
+    snap = CrossrefSnapshot(args.db)
+    n = snap.ingest(args.dumps)
+    print(f"{n} registros ingeridos en {args.db} (total: {len(snap)})")
+    if args.index:
+        from .biblio_index import BibliographicIndex
+
+        index = BibliographicIndex(args.db)
+        print(f"{index.build_from_snapshot(snap)} registros indexados para búsqueda bibliográfica")
+        index.optimize()
+
+
+if __name__ == "__main__":
+    main()
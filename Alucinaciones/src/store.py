@@ -0,0 +1,272 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .doi_extract import doi_key
+
+# TTL (segundos) por categoría de veredicto doi.org
+DEFAULT_TTLS: Dict[str, float] = {
+    "valid": 30 * 86400.0,
+    "invalid": 7 * 86400.0,
+    "unknown": 3600.0,
+}
+CROSSREF_TTL = 30 * 86400.0
+CROSSREF_MISS_TTL = 86400.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS doi_results (
+    key TEXT PRIMARY KEY,
+    doi TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    time REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crossref_records (
+    key TEXT PRIMARY KEY,
+    doi TEXT NOT NULL,
+    title TEXT,
+    source TEXT,
+    record TEXT,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Límite conservador de parámetros por sentencia en SQLite
+_CHUNK = 500
+
+
+def default_store_path() -> str:
+    return os.environ.get("DOI_STORE_PATH") or os.path.join(
+        os.path.expanduser("~"), ".cache", "doi_validator", "store.sqlite3"
+    )
+
+
+def _chunks(items: List[str], n: int = _CHUNK):
+    for i in range(0, len(items), n):
+        yield items[i : i + n]
+
+
+class ValidationStore:
+    """Caché persistente (SQLite, modo WAL) compartida entre ejecuciones y procesos.
+
+    - Veredictos doi.org con TTL distinto para valid / invalid / unknown.
+    - Registros Crossref (título + fuente y el registro crudo opcional).
+    - Lecturas masivas antes de despachar y escritura diferida por lotes
+      (write-behind): las escrituras se acumulan en memoria y se vuelcan
+      cada `batch_size` elementos o cada `flush_interval` segundos.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        crossref_ttl: float = CROSSREF_TTL,
+        batch_size: int = 200,
+        flush_interval: float = 2.0,
+    ):
+        self.path = path or default_store_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.crossref_ttl = float(crossref_ttl)
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        # los volcados escriben por su propia conexión, sin el lock de los lectores (WAL);
+        # ":memory:" es una base por conexión, así que ahí se comparte la de lectura
+        self._write_conn = self._conn if self.path == ":memory:" else self._connect()
+        self._flush_lock = threading.Lock()
+
+        self._pending_results: Dict[str, Tuple] = {}
+        self._pending_crossref: Dict[str, Tuple] = {}
+        # filas que se están volcando: siguen visibles para los lectores hasta el commit
+        self._flushing_results: Dict[str, Tuple] = {}
+        self._flushing_crossref: Dict[str, Tuple] = {}
+        self._closed = False
+        self._wake = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="ValidationStore-flush", daemon=True)
+        self._flusher.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # -----------------------------------------------------
+    # doi.org
+    # -----------------------------------------------------
+    def get_results(self, dois: Iterable[str]) -> Dict[str, Dict]:
+        """Lectura masiva. Devuelve {doi_key: entrada} solo para entradas vigentes.
+        La entrada tiene el mismo formato que el `cache` de `validate_doi_http`.
+        """
+        keys = list(dict.fromkeys(doi_key(d) for d in dois if doi_key(d)))
+        now = time.time()
+        out: Dict[str, Dict] = {}
+        with self._lock:
+            for k in keys:
+                p = self._pending_results.get(k) or self._flushing_results.get(k)
+                if p is not None and p[7] > now:
+                    out[k] = {"ok": bool(p[2]), "category": p[3], "status": p[4], "message": p[5], "time": p[6]}
+            missing = [k for k in keys if k not in out]
+            for chunk in _chunks(missing):
+                marks = ",".join("?" * len(chunk))
+                cur = self._conn.execute(
+                    f"SELECT key, ok, category, status, message, time FROM doi_results "
+                    f"WHERE key IN ({marks}) AND expires_at > ?",
+                    (*chunk, now),
+                )
+                for key, ok, cat, status, msg, rt in cur:
+                    out[key] = {"ok": bool(ok), "category": cat, "status": status, "message": msg, "time": rt}
+        return out
+
+    def put_result(self, doi: str, ok: bool, category: str, status: int, message: str, rt: float) -> None:
+        key = doi_key(doi)
+        if not key:
+            return
+        ttl = self.ttls.get(category, self.ttls["unknown"])
+        row = (key, doi, int(bool(ok)), category, int(status or 0), message or "", float(rt or 0.0), time.time() + ttl)
+        with self._lock:
+            self._pending_results[key] = row
+            full = len(self._pending_results) + len(self._pending_crossref) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    # -----------------------------------------------------
+    # Crossref
+    # -----------------------------------------------------
+    def get_crossref(self, dois: Iterable[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Lectura masiva. Devuelve {doi_key: (title, container_or_publisher)}."""
+        keys = list(dict.fromkeys(doi_key(d) for d in dois if doi_key(d)))
+        now = time.time()
+        out: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        with self._lock:
+            for k in keys:
+                p = self._pending_crossref.get(k) or self._flushing_crossref.get(k)
+                if p is not None and p[5] > now:
+                    out[k] = (p[2], p[3])
+            missing = [k for k in keys if k not in out]
+            for chunk in _chunks(missing):
+                marks = ",".join("?" * len(chunk))
+                cur = self._conn.execute(
+                    f"SELECT key, title, source FROM crossref_records WHERE key IN ({marks}) AND expires_at > ?",
+                    (*chunk, now),
+                )
+                for key, title, source in cur:
+                    out[key] = (title, source)
+        return out
+
+    def get_crossref_record(self, doi: str) -> Optional[Dict]:
+        key = doi_key(doi)
+        now = time.time()
+        with self._lock:
+            p = self._pending_crossref.get(key) or self._flushing_crossref.get(key)
+            if p is not None and p[5] > now:
+                return json.loads(p[4]) if p[4] else None
+            row = self._conn.execute(
+                "SELECT record FROM crossref_records WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def put_crossref(
+        self,
+        doi: str,
+        title: Optional[str],
+        source: Optional[str],
+        record: Optional[Dict] = None,
+    ) -> None:
+        key = doi_key(doi)
+        if not key:
+            return
+        ttl = self.crossref_ttl if (title or source) else CROSSREF_MISS_TTL
+        payload = json.dumps(record, ensure_ascii=False) if record else None
+        row = (key, doi, title, source, payload, time.time() + ttl)
+        with self._lock:
+            self._pending_crossref[key] = row
+            full = len(self._pending_results) + len(self._pending_crossref) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    # -----------------------------------------------------
+    # Write-behind
+    # -----------------------------------------------------
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending_results and not self._pending_crossref:
+                    return
+                # se retira el búfer bajo el lock y se escribe fuera de él
+                self._flushing_results, self._pending_results = self._pending_results, {}
+                self._flushing_crossref, self._pending_crossref = self._pending_crossref, {}
+            conn = self._write_conn
+            try:
+                with (self._lock if conn is self._conn else nullcontext()), conn:
+                    if self._flushing_results:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO doi_results "
+                            "(key, doi, ok, category, status, message, time, expires_at) VALUES (?,?,?,?,?,?,?,?)",
+                            list(self._flushing_results.values()),
+                        )
+                    if self._flushing_crossref:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO crossref_records "
+                            "(key, doi, title, source, record, expires_at) VALUES (?,?,?,?,?,?)",
+                            list(self._flushing_crossref.values()),
+                        )
+            except BaseException:
+                # SQLite falló (p. ej. "database is locked"): las filas vuelven a pendientes
+                # para el próximo intento, sin pisar las escritas mientras tanto
+                with self._lock:
+                    self._pending_results = {**self._flushing_results, **self._pending_results}
+                    self._pending_crossref = {**self._flushing_crossref, **self._pending_crossref}
+                raise
+            finally:
+                with self._lock:
+                    self._flushing_results = {}
+                    self._flushing_crossref = {}
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock, self._conn:
+            n = self._conn.execute("DELETE FROM doi_results WHERE expires_at <= ?", (now,)).rowcount
+            n += self._conn.execute("DELETE FROM crossref_records WHERE expires_at <= ?", (now,)).rowcount
+        return n
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # otro proceso puede tener el lock; se reintenta en el siguiente ciclo
+                continue
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._flusher.join(timeout=5.0)
+        self.flush()
+        with self._lock:
+            if self._write_conn is not self._conn:
+                self._write_conn.close()
+            self._conn.close()
+
+    def __enter__(self) -> "ValidationStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,28 +1,35 @@
 from __future__ import annotations
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
 import re
+import time
 from io import BytesIO
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
-from src.doi_validate import validate_doi_http
-from src.metadata import crossref_title_by_doi, title_match_score, title_match_label
-from src.reporting import to_dataframe, make_txt_report
-from src.doi_extract import clean_doi, is_valid_doi_format
+from src.resolver import DOIResolver
+from src.metadata import crossref_titles_by_dois, title_match_labels, title_match_scores
+from src.reporting import PARQUET_AVAILABLE, export_bytes, to_dataframe, make_txt_report
+from src.doi_extract import clean_doi, is_valid_doi_format, doi_key, scan_dois
+from src.extract_cache import ExtractionCache
+from src.pdf_extract import available_backends
+from src.pipeline import run_pipeline
+from src.prefixes import PrefixRegistry, default_prefixes_path
+from src.singleflight import SingleFlightCache
+from src.store import ValidationStore
 
 # ---- Utilidades (Figshare + extracción robusta) ----
 from documento import (
     figshare_list_theses,
-    figshare_article_detail,
-    figshare_extract_pdf_urls,
-    figshare_download_pdf_bytes,
-    process_pdf_bytes_to_doi_rows,
-    extract_dois_robust,
+    harvest_figshare,
+    spool_to_tempfile,
+    process_pdfs_parallel,
 )
+from service import ServiceClient, default_service_url, run_remote_pipeline
 
 # =========================
 # CONFIG UI
@@ -71,6 +78,35 @@ def _apply_layout(fig: go.Figure, titulo: str = "", titulo_x: str = "", titulo_y
     return fig
 
 
+# Resultados en vivo: se redibuja como mucho cada LIVE_REFRESH_SEC (más espaciado
+# cuanto más grande es la tabla), así el hilo de la UI no frena a los workers
+LIVE_REFRESH_SEC = 0.75
+LIVE_ROWS_PER_STEP = 2000
+MAX_WORKERS = 32  # techo del slider de hilos (y tamaño del pool HTTP compartido)
+LIVE_COLUMNS = ["Estado", "DOI", "Categoría", "Código HTTP", "Archivo", "Página", "Mensaje"]
+
+
+def _render_live(kpi_slot, table_slot, rows: List[Dict[str, Any]], counts: Dict[str, int], found: int) -> None:
+    with kpi_slot.container():
+        c1, c2, c3, c4, c5 = st.columns(5)
+        c1.metric("Validados", f"{len(rows)}/{found}")
+        c2.metric("✅ Válidos", f"{counts.get('válido', 0)}")
+        c3.metric("❌ Inválidos", f"{counts.get('inválido', 0)}")
+        c4.metric("⚠️ Sospechosos", f"{counts.get('sospechoso', 0)}")
+        c5.metric("❓ Desconocidos", f"{counts.get('desconocido', 0)}")
+    live = pd.DataFrame(rows, columns=[c for c in LIVE_COLUMNS if not rows or c in rows[0]])
+    # los más recientes arriba: lo nuevo es lo que hay que revisar
+    table_slot.dataframe(live.iloc[::-1], use_container_width=True, hide_index=True, height=320)
+
+
+def _unlink_quiet(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
 def _dedupe_dois(dois_info: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     seen = set()
     out = []
@@ -85,7 +121,7 @@ def _dedupe_dois(dois_info: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
 
 def _parse_pasted_dois(text: str) -> List[Dict[str, Any]]:
     # Extrae DOIs de cualquier pegado (líneas, URLs, texto)
-    found = extract_dois_robust(text or "")
+    found = scan_dois(text or "")
     rows = []
     for d in found:
         rows.append(
@@ -219,6 +255,73 @@ def _categorize_doi(category: str, http_status: Any) -> str:
     return category
 
 
+# Iconos por categoría
+ICON_MAP = {
+    "válido": "✅",
+    "inválido": "❌",
+    "sospechoso": "⚠️",
+    "desconocido": "❓"
+}
+TITLE_LABELS = {"match": "coincide", "mismatch": "no_coincide", "unknown": "desconocido"}
+
+
+def _result_row(
+    d: Dict[str, Any],
+    result: Tuple[str, bool, str, int, str, float],
+    crossref: Optional[Tuple[Optional[str], Optional[str]]],
+) -> Dict[str, Any]:
+    """Fila de resultados a partir de la info extraída, el veredicto doi.org y (opcional) Crossref."""
+    doi, ok, category, http_status, message, rt = result
+    # Categorización refinada
+    refined_category = _categorize_doi(category, http_status)
+    r = {
+        "DOI": doi,
+        "URL": f"https://doi.org/{doi}",
+        "Categoría": refined_category,
+        "Estado": ICON_MAP.get(refined_category, "❓"),
+        "Código HTTP": http_status if http_status is not None else "N/A",
+        "Mensaje": message,
+        "Tiempo (s)": round(float(rt or 0.0), 3),
+        "Archivo": d.get("file_name", "N/A"),
+        "Página": d.get("page", "N/A"),
+        "Patrón": d.get("pattern", ""),
+        "Contexto": d.get("context", ""),
+        "Referencia (línea)": d.get("reference_line", ""),
+        "Título (Bibliografía)": d.get("bib_title", ""),
+        "Figshare ID": d.get("figshare_id", ""),
+        "Figshare URL": d.get("figshare_url", ""),
+        "PDF URL": d.get("pdf_url", ""),
+    }
+    if crossref is None:
+        return r
+
+    cr_title, cr_src = crossref
+    r["Título (Crossref)"] = cr_title or ""
+    r["Fuente (Crossref)"] = cr_src or ""
+    # el match de título se calcula por lotes en `_score_titles`
+    r["Score título"] = ""
+    r["Título match"] = "desconocido"
+    return r
+
+
+def _score_titles(rows: List[Dict[str, Any]], start: int, title_threshold: Optional[float]) -> int:
+    """Puntúa de una vez el match de título de las filas nuevas (`rows[start:]`).
+    Devuelve hasta dónde quedó puntuado, para el siguiente micro-lote."""
+    pending = [r for r in rows[start:] if "Título (Crossref)" in r]
+    if title_threshold is None or not pending:
+        return len(rows)
+    scores = title_match_scores(
+        [r.get("Título (Bibliografía)") for r in pending],
+        [r.get("Título (Crossref)") for r in pending],
+    )
+    labels = title_match_labels(scores, title_threshold)
+    for r, score, label in zip(pending, scores, labels):
+        r["Score título"] = "" if np.isnan(score) else round(float(score), 3)
+        # Traducir etiquetas de match
+        r["Título match"] = TITLE_LABELS.get(str(label), "desconocido")
+    return len(rows)
+
+
 # =========================
 # Sidebar
 # =========================
@@ -226,7 +329,14 @@ with st.sidebar:
     st.header("Parámetros")
     timeout = st.slider("Timeout (segundos)", min_value=3, max_value=40, value=15, step=1)
     max_retries = st.slider("Reintentos (doi.org)", min_value=0, max_value=5, value=2, step=1)
-    workers = st.slider("Hilos (workers)", min_value=1, max_value=32, value=10, step=1)
+    workers = st.slider(
+        "Hilos (workers)",
+        min_value=1,
+        max_value=MAX_WORKERS,
+        value=10,
+        step=1,
+        help="Techo de concurrencia: el control adaptativo (AIMD) sube hasta este valor y retrocede ante 429/5xx o latencia alta",
+    )
 
     st.divider()
     st.subheader("📚 Estilo de referencias")
@@ -243,9 +353,36 @@ with st.sidebar:
     title_threshold = st.slider("Umbral de match de título", min_value=0.5, max_value=0.95, value=0.78, step=0.01)
 
     st.divider()
-    pdf_scope = st.radio("Extracción PDF", ["Últimas N páginas (recomendado)", "Todo el PDF (más lento)"], index=0)
+    pdf_scope = st.radio(
+        "Extracción PDF",
+        ["Solo bibliografía (recomendado)", "Últimas N páginas", "Todo el PDF (más lento)"],
+        index=0,
+        help="Bibliografía: localiza la sección por marcadores del PDF o buscando el encabezado desde el final; si no la encuentra, usa las últimas N páginas",
+    )
     max_pages_from_end = st.slider("N páginas desde el final", 2, 40, 10, 1)
     prefer_refs_section = st.checkbox("Priorizar sección de referencias (si se detecta)", value=True)
+    pdf_workers = st.slider(
+        "Procesos de extracción PDF",
+        min_value=1,
+        max_value=max(2, os.cpu_count() or 1),
+        value=max(1, os.cpu_count() or 1),
+        step=1,
+        help="PDFs extraídos en paralelo (un proceso por núcleo). Con 1 se extrae en el proceso de la app",
+    )
+    pdf_backend = st.selectbox(
+        "Motor de extracción PDF",
+        options=available_backends(),
+        index=0,
+        help="auto: motor rápido de solo texto y pdfplumber únicamente si el texto sale degradado (poco texto o DOIs partidos)",
+    )
+
+    st.divider()
+    service_url = st.text_input(
+        "Servicio de validación (URL, opcional)",
+        value=default_service_url(),
+        help="p. ej. http://127.0.0.1:8765 (python service.py). La validación y Crossref se hacen en el servicio, "
+        "con caché y pool compartidos entre analistas; la extracción de PDFs sigue siendo local",
+    ).strip()
 
 st.title("📚 Validación DOI")
 st.caption("Fuentes: múltiples PDFs, pegar DOIs, o Figshare (API). Validación con doi.org y (opcional) Crossref.")
@@ -255,7 +392,6 @@ st.caption("Fuentes: múltiples PDFs, pegar DOIs, o Figshare (API). Validación
 # =========================
 tabs_in = st.tabs(["📄 PDFs", "📋 Pegar DOIs", "🔗 Figshare"])
 
-all_dois_info: List[Dict[str, Any]] = []
 pdf_results: List[Dict[str, Any]] = []
 docs_procesados = 0
 
@@ -308,8 +444,35 @@ with tabs_in[2]:
 # =========================
 # Cache
 # =========================
-if "doi_cache" not in st.session_state:
-    st.session_state["doi_cache"] = {}
+@st.cache_resource
+def get_validation_store() -> ValidationStore:
+    # Compartida entre sesiones y persistente entre reinicios (SQLite)
+    return ValidationStore()
+
+
+store = get_validation_store()
+
+
+@st.cache_resource
+def get_extract_cache() -> ExtractionCache:
+    # Texto y filas DOI por hash del PDF: re-subidas y reruns no vuelven a parsear
+    return ExtractionCache()
+
+
+@st.cache_resource
+def get_prefix_registry() -> PrefixRegistry:
+    # Prefijos de registrante conocidos/inexistentes (persistidos entre reinicios)
+    return PrefixRegistry.load(default_prefixes_path())
+
+
+@st.cache_resource
+def get_resolver() -> DOIResolver:
+    # Pool keep-alive compartido por todos los hilos y sesiones: uno solo, dimensionado
+    # para el máximo de hilos; timeout y reintentos se pasan en cada validación
+    return DOIResolver(pool_size=MAX_WORKERS, prefixes=get_prefix_registry())
+
+if not isinstance(st.session_state.get("doi_cache"), SingleFlightCache):
+    st.session_state["doi_cache"] = SingleFlightCache()
 if "crossref_cache" not in st.session_state:
     st.session_state["crossref_cache"] = {}
 
@@ -317,181 +480,219 @@ if "crossref_cache" not in st.session_state:
 # Ejecutar extracción + validación
 # =========================
 if st.button("🚀 Extraer y Validar", type="primary"):
-    # --- A) extraer de PDFs ---
-    pdf_mode = "full" if pdf_scope.startswith("Todo") else "tail"
-    if uploaded_files:
-        docs_procesados += len(uploaded_files)
-        pdf_progress = st.progress(0)
-        pdf_status = st.empty()
-        for idx, uploaded_file in enumerate(uploaded_files, 1):
-            pdf_status.text(f"Extrayendo DOIs de {uploaded_file.name} ({idx}/{len(uploaded_files)})...")
-            pdf_bytes = uploaded_file.read()
-            dois_info, ref_lines = process_pdf_bytes_to_doi_rows(
-                pdf_bytes,
-                file_name=uploaded_file.name,
-                mode=pdf_mode,
-                max_pages_from_end=int(max_pages_from_end),
-                prefer_refs_section=bool(prefer_refs_section),
-            )
-            # enriquecer con bib title
-            for d in dois_info:
-                ref = d.get("reference_line") or ""
-                d["bib_title"] = extract_title_by_style(ref, citation_style) or ""
-            all_dois_info.extend(dois_info)
-            pdf_progress.progress(idx / len(uploaded_files))
-        pdf_progress.empty()
-        pdf_status.empty()
-
-    # --- B) extraer de pegado ---
-    if pasted_text and pasted_text.strip():
-        pasted_rows = _parse_pasted_dois(pasted_text)
-        # Agregar títulos según estilo seleccionado
-        for d in pasted_rows:
+    pdf_mode = "full" if pdf_scope.startswith("Todo") else ("refs" if pdf_scope.startswith("Solo") else "tail")
+    cache = st.session_state["doi_cache"]
+    cr_cache = st.session_state["crossref_cache"]
+    resolver = get_resolver()
+
+    n_sources = len(uploaded_files or []) + (1 if pasted_text and pasted_text.strip() else 0) + len(fig_ids)
+    docs_procesados += len(uploaded_files or [])
+
+    def _with_bib_titles(dois_info: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for d in dois_info:
             ref = d.get("reference_line") or ""
             d["bib_title"] = extract_title_by_style(ref, citation_style) or ""
-        all_dois_info.extend(pasted_rows)
-
-    # --- C) extraer de Figshare ---
-    if fig_ids:
-        fig_prog = st.progress(0)
-        fig_status = st.empty()
-        for i, aid in enumerate(fig_ids, 1):
-            fig_status.text(f"Figshare {i}/{len(fig_ids)}: id {aid}")
-            detail = figshare_article_detail(aid, timeout_sec=float(timeout))
-            if not detail:
-                fig_prog.progress(i / len(fig_ids))
-                continue
-            pdf_urls = figshare_extract_pdf_urls(detail)
-            if not pdf_urls:
-                fig_prog.progress(i / len(fig_ids))
+        # lectura masiva del almacén persistente: los aciertos no tocan la red
+        cache.update(store.get_results(d["doi"] for d in dois_info if doi_key(d["doi"]) not in cache))
+        return _dedupe_dois(dois_info)
+
+    extract_stats: List[Dict[str, Any]] = []
+
+    # Se ejecuta en el hilo de extracción del pipeline: sin llamadas a `st.*`
+    def _extracted_sources():
+        # --- A) pegado (no necesita extracción) ---
+        if pasted_text and pasted_text.strip():
+            yield "Pegado", _with_bib_titles(_parse_pasted_dois(pasted_text))
+
+        # --- B) PDFs subidos + Figshare, extraídos en paralelo (pool de procesos) ---
+        meta: List[Dict[str, Any]] = []  # por índice de entrada: fuente y campos Figshare
+        empty_sources: List[str] = []
+
+        # Cada PDF pasa por un temporal en disco: los workers reciben la ruta, no una copia en memoria
+        def _pdf_inputs():
+            for uploaded_file in uploaded_files or []:
+                try:
+                    path = spool_to_tempfile(uploaded_file)
+                except OSError as e:
+                    extract_stats.append({"Archivo": uploaded_file.name, "Error": f"{type(e).__name__}: {e}"})
+                    continue
+                meta.append({"source": uploaded_file.name, "tmp": path})
+                yield path, uploaded_file.name
+            # Figshare: detalles y descargas concurrentes con la sesión compartida, todos los PDFs del artículo
+            for fmeta, path, err in harvest_figshare(fig_ids, workers=4, timeout_sec=float(timeout)):
+                source = f"Figshare id:{fmeta['figshare_id']}"
+                if path is None:
+                    # detalle fallido, artículo sin PDF o descarga fallida: queda el motivo
+                    name = f"{source} · {fmeta['pdf_name']}" if fmeta.get("pdf_name") else source
+                    extract_stats.append({"Archivo": name, "Error": err or "sin PDF"})
+                    empty_sources.append(source)
+                    continue
+                name = fmeta["title"]
+                if fmeta["n_pdfs"] > 1:
+                    source = f"{source} · {fmeta['pdf_name']}"
+                    name = f"{name} · {fmeta['pdf_name']}"
+                meta.append({
+                    "source": source,
+                    "figshare_id": fmeta["figshare_id"],
+                    "figshare_url": fmeta["figshare_url"],
+                    "pdf_url": fmeta["pdf_url"],
+                    "tmp": path,
+                })
+                yield path, name
+
+        results = process_pdfs_parallel(
+            _pdf_inputs(),
+            workers=int(pdf_workers),
+            mode=pdf_mode,
+            max_pages_from_end=int(max_pages_from_end),
+            prefer_refs_section=bool(prefer_refs_section),
+            backend=pdf_backend,
+            cache=get_extract_cache(),
+        )
+        try:
+            yield from _extracted_pdfs(results, meta)
+        finally:
+            results.close()
+            for m in meta:
+                _unlink_quiet(m.pop("tmp", None))
+
+        for source in empty_sources:
+            yield source, []
+
+    def _extracted_pdfs(results, meta: List[Dict[str, Any]]):
+        for i, name, dois_info, _refs, info, err in results:
+            _unlink_quiet(meta[i].pop("tmp", None))
+            extract_stats.append({
+                "Archivo": name,
+                "Motor": info.get("backend", ""),
+                "Respaldo": "Sí" if info.get("fallback") else "",
+                "Caché": "Sí" if info.get("cached") else "",
+                "Páginas": info.get("pages", 0),
+                "Localización": info.get("locator", ""),
+                "ms/página": info.get("ms_per_page", 0.0),
+                "Error": err or "",
+            })
+            extra = {k: v for k, v in meta[i].items() if k != "source"}
+            for d in dois_info:
+                d.update(extra)
+            yield meta[i]["source"], _with_bib_titles(dois_info)
+
+    def _validate(doi: str):
+        fresh = doi_key(doi) not in cache
+        res = resolver.validate(doi, cache=cache, timeout=float(timeout), max_retries=int(max_retries))
+        if fresh:
+            store.put_result(*res)
+        return res
+
+    def _enrich(dois: List[str]):
+        missing = [d for d in dois if doi_key(d) not in cr_cache]
+        cr_cache.update(store.get_crossref(missing))
+        # un puñado de consultas /works filtradas por lote en lugar de una por DOI
+        missing = [d for d in missing if doi_key(d) not in cr_cache]
+        for key, (cr_title, cr_src) in crossref_titles_by_dois(missing, timeout=float(timeout)).items():
+            cr_cache[key] = (cr_title, cr_src)
+            store.put_crossref(key, cr_title, cr_src)
+        return {doi_key(d): cr_cache.get(doi_key(d), (None, None)) for d in dois}
+
+    # --- Pipeline en streaming: extracción → doi.org → Crossref, con colas acotadas ---
+    progress = st.progress(0)
+    status = st.empty()
+    live_kpis = st.empty()
+    live_table = st.empty()
+    rows: List[Dict[str, Any]] = []
+    counts: Dict[str, int] = {}
+    sources_done = 0
+    found = 0
+    last_draw = 0.0
+    run_errors: List[str] = []
+    match_threshold = float(title_threshold) if validate_title_match else None
+    scored = 0  # filas con el match de título ya calculado
+
+    # La misma lista vive en session_state: si la ejecución se detiene (Stop o
+    # cualquier interacción que relance el script), lo ya validado no se pierde
+    st.session_state["df"] = None
+    st.session_state["run_rows"] = rows
+    st.session_state["run_complete"] = False
+    st.session_state["docs_procesados"] = docs_procesados
+    st.session_state["extract_stats"] = extract_stats
+
+    if service_url:
+        events = run_remote_pipeline(_extracted_sources(), ServiceClient(service_url), crossref=include_crossref)
+    else:
+        events = run_pipeline(
+            _extracted_sources(),
+            _validate,
+            enrich=_enrich if include_crossref else None,
+            validate_workers=int(workers),
+        )
+    try:
+        for ev in events:
+            if ev["type"] == "source":
+                sources_done += 1
+                # un artículo Figshare con varios PDFs aporta una fuente por archivo
+                n_sources = max(n_sources, sources_done)
+                found += ev["new"]
+            elif ev["type"] == "result":
+                row = _result_row(ev["info"], ev["result"], ev["crossref"])
+                rows.append(row)
+                counts[row["Categoría"]] = counts.get(row["Categoría"], 0) + 1
+            if ev["type"] == "error":
+                err = ev["error"]
+                msg = f"{type(err).__name__}: {err}" if isinstance(err, BaseException) else str(err)
+                run_errors.append(f"{ev['stage']} · {ev.get('source') or '—'}: {msg}")
+                if ev["stage"] == "extract":
+                    extract_stats.append({"Archivo": ev.get("source") or "—", "Error": msg})
                 continue
-            # toma el primer PDF
-            pdf_url = pdf_urls[0]
-            try:
-                pdf_bytes = figshare_download_pdf_bytes(pdf_url, timeout_sec=float(timeout))
-                dois_info, ref_lines = process_pdf_bytes_to_doi_rows(
-                    pdf_bytes,
-                    file_name=(detail.get("title") or f"Figshare id:{aid}"),
-                    mode=pdf_mode,
-                    max_pages_from_end=int(max_pages_from_end),
-                    prefer_refs_section=bool(prefer_refs_section),
+            # micro-lotes: el estado y la tabla se redibujan con intervalo acotado, no por evento
+            now = time.monotonic()
+            if now - last_draw >= LIVE_REFRESH_SEC * (1 + len(rows) // LIVE_ROWS_PER_STEP):
+                last_draw = now
+                status.text(
+                    f"Fuentes {sources_done}/{n_sources} | DOIs únicos: {found} | Validados: {len(rows)}"
                 )
-                for d in dois_info:
-                    d["figshare_id"] = aid
-                    d["figshare_url"] = detail.get("figshare_url") or ""
-                    d["pdf_url"] = pdf_url
-                    ref = d.get("reference_line") or ""
-                    d["bib_title"] = extract_title_by_style(ref, citation_style) or ""
-                all_dois_info.extend(dois_info)
-            except Exception:
-                pass
-            fig_prog.progress(i / len(fig_ids))
-        fig_prog.empty()
-        fig_status.empty()
-
-    unique_dois = _dedupe_dois(all_dois_info)
-
-    st.write(f"DOIs únicos encontrados: **{len(unique_dois)}**")
-    if not unique_dois:
+                progress.progress(min(1.0, len(rows) / max(1, found)))
+                if rows:
+                    scored = _score_titles(rows, scored, match_threshold)
+                    _render_live(live_kpis, live_table, rows, counts, found)
+    finally:
+        _score_titles(rows, scored, match_threshold)
+        store.flush()
+        if resolver.prefixes is not None and resolver.prefixes.dirty:
+            resolver.prefixes.save(default_prefixes_path())
+
+    live_kpis.empty()
+    live_table.empty()
+    for msg in list(dict.fromkeys(run_errors))[:5]:
+        st.warning(f"Error durante la ejecución ({msg})")
+    if len(run_errors) > 5:
+        st.caption(f"… y {len(run_errors) - 5} errores más (ver detalle de extracción).")
+    st.write(f"DOIs únicos encontrados: **{found}**")
+    if not rows:
+        status.empty()
+        progress.empty()
         st.warning("No se encontraron DOIs en ninguna fuente.")
         st.stop()
 
-    # --- Validación HTTP (doi.org) en paralelo ---
-    progress = st.progress(0)
-    status = st.empty()
-
-    rows = []
-    cache = st.session_state["doi_cache"]
-
-    with ThreadPoolExecutor(max_workers=int(workers)) as ex:
-        futs = []
-        for d in unique_dois:
-            futs.append(ex.submit(validate_doi_http, d["doi"], float(timeout), int(max_retries), cache))
-
-        done = 0
-        for fut in as_completed(futs):
-            doi, ok, category, http_status, message, rt = fut.result()
-            done += 1
-            progress.progress(done / max(1, len(unique_dois)))
-            status.text(f"Validando {done}/{len(unique_dois)} ...")
-
-            # Categorización refinada
-            refined_category = _categorize_doi(category, http_status)
-            
-            # Iconos por categoría
-            icon_map = {
-                "válido": "✅",
-                "inválido": "❌",
-                "sospechoso": "⚠️",
-                "desconocido": "❓"
-            }
-
-            rows.append(
-                {
-                    "DOI": doi,
-                    "URL": f"https://doi.org/{doi}",
-                    "Categoría": refined_category,
-                    "Estado": icon_map.get(refined_category, "❓"),
-                    "Código HTTP": http_status if http_status is not None else "N/A",
-                    "Mensaje": message,
-                    "Tiempo (s)": round(float(rt or 0.0), 3),
-                }
-            )
-
-    # reconectar info auxiliar
-    by_doi = {d["doi"].lower(): d for d in unique_dois}
-    for r in rows:
-        d = by_doi.get(r["DOI"].lower(), {})
-        r["Archivo"] = d.get("file_name", "N/A")
-        r["Página"] = d.get("page", "N/A")
-        r["Patrón"] = d.get("pattern", "")
-        r["Contexto"] = d.get("context", "")
-        r["Referencia (línea)"] = d.get("reference_line", "")
-        r["Título (Bibliografía)"] = d.get("bib_title", "")
-        r["Figshare ID"] = d.get("figshare_id", "")
-        r["Figshare URL"] = d.get("figshare_url", "")
-        r["PDF URL"] = d.get("pdf_url", "")
-
-    # --- Crossref + match ---
-    if include_crossref:
-        status.text("Consultando títulos por DOI (Crossref)...")
-        cr_cache = st.session_state["crossref_cache"]
-        for i, r in enumerate(rows, start=1):
-            doi = r["DOI"]
-            key = doi.lower()
-            if key in cr_cache:
-                cr_title, cr_src = cr_cache[key]
-            else:
-                cr_title, cr_src = crossref_title_by_doi(doi, timeout=float(timeout))
-                cr_cache[key] = (cr_title, cr_src)
-
-            r["Título (Crossref)"] = cr_title or ""
-            r["Fuente (Crossref)"] = cr_src or ""
-
-            if validate_title_match:
-                score = title_match_score(r.get("Título (Bibliografía)"), r.get("Título (Crossref)"))
-                r["Score título"] = "" if score is None else score
-                label = title_match_label(score, float(title_threshold))
-                # Traducir etiquetas de match
-                label_traduccion = {"match": "coincide", "mismatch": "no_coincide", "unknown": "desconocido"}
-                r["Título match"] = label_traduccion.get(label, "desconocido")
-            else:
-                r["Score título"] = ""
-                r["Título match"] = "desconocido"
-
-            status.text(f"Crossref {i}/{len(rows)}")
-
     df = to_dataframe(rows)
     st.session_state["df"] = df
-    st.session_state["docs_procesados"] = docs_procesados
+    st.session_state["run_complete"] = True
 
     status.empty()
     progress.empty()
     st.success("Validación completada.")
+    coalesced = cache.stats()["coalesced"]
+    if coalesced:
+        st.caption(f"Consultas duplicadas en vuelo resueltas con una sola petición: {coalesced}")
 
 df = st.session_state.get("df")
 docs_procesados = st.session_state.get("docs_procesados", 0)
 
+# Ejecución interrumpida: se muestran los resultados parciales que alcanzaron a validarse
+if df is None and st.session_state.get("run_rows") and not st.session_state.get("run_complete"):
+    df = to_dataframe(list(st.session_state["run_rows"]))
+    st.session_state["df"] = df
+    st.warning(f"Ejecución interrumpida: se muestran {len(df)} resultados parciales.")
+
 if df is None or df.empty:
     st.info("Carga DOIs (en alguna fuente) y haz clic en **Extraer y Validar**.")
     st.stop()
@@ -610,6 +811,11 @@ with tabs[0]:
         tm_fig = _apply_layout(tm_fig, titulo="Resultado de match de título", titulo_x="Resultado", titulo_y="Cantidad", altura=320)
         st.plotly_chart(tm_fig, use_container_width=True)
 
+    extract_stats = st.session_state.get("extract_stats") or []
+    if extract_stats:
+        with st.expander("Extracción PDF: motor, tiempo por página y errores"):
+            st.dataframe(pd.DataFrame(extract_stats), use_container_width=True, hide_index=True)
+
 with tabs[1]:
     st.subheader("Tabla de resultados")
     
@@ -651,4 +857,7 @@ with tabs[2]:
     csv_bytes = df.to_csv(index=False).encode("utf-8")
     st.download_button("⬇️ Descargar CSV", data=csv_bytes, file_name="resultados_doi.csv", mime="text/csv")
     txt = make_txt_report(df)
-    st.download_button("⬇️ Descargar TXT", data=txt.encode("utf-8"), file_name="reporte_doi.txt", mime="text/plain")
\ No newline at end of file
+    st.download_button("⬇️ Descargar TXT", data=txt.encode("utf-8"), file_name="reporte_doi.txt", mime="text/plain")
+    st.download_button("⬇️ Descargar JSONL", data=export_bytes(df, "jsonl"), file_name="resultados_doi.jsonl", mime="application/x-ndjson")
+    if PARQUET_AVAILABLE:
+        st.download_button("⬇️ Descargar Parquet", data=export_bytes(df, "parquet"), file_name="resultados_doi.parquet", mime="application/octet-stream")
\ No newline at end of file
@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from documento import harvest_figshare, process_pdfs_parallel
+from src.doi_extract import doi_key, scan_dois
+from src.extract_cache import ExtractionCache
+from src.metadata import crossref_titles_by_dois
+from src.pipeline import run_pipeline
+from src.prefixes import PrefixRegistry, default_prefixes_path
+from src.reporting import ChunkedWriter, JsonlChunkWriter, ParquetChunkWriter, export_format, open_chunk_writer
+from src.resolver import DOIResolver
+from src.singleflight import SingleFlightCache
+from src.store import ValidationStore
+
+# Parquet (opcional)
+try:
+    import pyarrow as pa  # type: ignore
+except Exception:  # pragma: no cover
+    pa = None
+
+# Columnas de salida (mismo orden en JSONL, CSV y Parquet)
+ROW_FIELDS = [
+    ("source", "string"),
+    ("file_name", "string"),
+    ("page", "int64"),
+    ("doi", "string"),
+    ("pattern", "string"),
+    ("reference_line", "string"),
+    ("figshare_id", "int64"),
+    ("figshare_url", "string"),
+    ("pdf_url", "string"),
+    ("ok", "bool"),
+    ("category", "string"),
+    ("status", "int64"),
+    ("message", "string"),
+    ("time", "float64"),
+    ("crossref_title", "string"),
+    ("crossref_source", "string"),
+]
+
+_DOI_LIST_CHUNK = 2000  # líneas por lote al leer listas de DOIs
+
+
+# =========================================================
+# Entradas (todas perezosas)
+# =========================================================
+def iter_pdf_paths(specs: Iterable[str]) -> Iterator[str]:
+    """PDFs de directorios (recursivo), archivos sueltos o patrones glob (`**` admitido)."""
+    for spec in specs:
+        if os.path.isdir(spec):
+            for root, dirs, files in os.walk(spec):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(spec):
+            yield spec
+        else:
+            for path in glob.iglob(spec, recursive=True):
+                if os.path.isfile(path) and path.lower().endswith(".pdf"):
+                    yield path
+
+
+def iter_doi_lists(paths: Iterable[str], chunk_lines: int = _DOI_LIST_CHUNK) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """`(fuente, filas)` por cada bloque de `chunk_lines` líneas de cada lista de DOIs
+    (una por línea, URLs o texto libre; `-` = entrada estándar)."""
+    for path in paths:
+        name = "stdin" if path == "-" else os.path.basename(path)
+        fh = sys.stdin if path == "-" else open(path, encoding="utf-8", errors="replace")
+        try:
+            block: List[str] = []
+            n = 0
+            for line in fh:
+                block.append(line)
+                if len(block) >= int(chunk_lines):
+                    n += 1
+                    yield f"DOIs {name} #{n}", _doi_rows("".join(block), name)
+                    block = []
+            if block:
+                yield f"DOIs {name} #{n + 1}", _doi_rows("".join(block), name)
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+
+def _doi_rows(text: str, name: str) -> List[Dict[str, Any]]:
+    rows = scan_dois(text)
+    for d in rows:
+        d.update(file_name=name, page="N/A", reference_line="")
+    return rows
+
+
+def _unlink_quiet(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def iter_pdf_sources(
+    pdf_specs: Iterable[str],
+    figshare_ids: Iterable[int],
+    pdf_workers: Optional[int] = None,
+    mode: str = "refs",
+    max_pages_from_end: int = 10,
+    backend: str = "auto",
+    download_workers: int = 4,
+    timeout_sec: float = 60.0,
+    cache: Optional[ExtractionCache] = None,
+    errors: Optional[List[str]] = None,
+) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """`(fuente, filas)` por PDF local o de Figshare, extraídos en el pool de procesos.
+    Los PDFs locales se leen desde su ruta; los de Figshare pasan por un temporal
+    que se borra al terminar su extracción. Solo hay `2 × pdf_workers` archivos en vuelo.
+    """
+    meta: Dict[int, Dict[str, Any]] = {}
+    index = [0]
+
+    def add(m: Dict[str, Any]) -> None:
+        meta[index[0]] = m
+        index[0] += 1
+
+    def inputs():
+        for path in iter_pdf_paths(pdf_specs):
+            add({"source": path})
+            yield path, os.path.basename(path)
+        ids = list(figshare_ids)
+        if not ids:
+            return
+        for fmeta, path, err in harvest_figshare(ids, workers=download_workers, timeout_sec=timeout_sec):
+            source = f"Figshare id:{fmeta['figshare_id']}"
+            if path is None:
+                if errors is not None:
+                    errors.append(f"{source}: {err}")
+                continue
+            add({
+                "source": f"{source} · {fmeta['pdf_name']}",
+                "figshare_id": fmeta["figshare_id"],
+                "figshare_url": fmeta["figshare_url"],
+                "pdf_url": fmeta["pdf_url"],
+                "tmp": path,
+            })
+            yield path, f"{fmeta['title']} · {fmeta['pdf_name']}"
+
+    results = process_pdfs_parallel(
+        inputs(),
+        workers=pdf_workers,
+        mode=mode,
+        max_pages_from_end=max_pages_from_end,
+        backend=backend,
+        cache=cache,
+    )
+    try:
+        for i, _name, dois_info, _refs, _info, err in results:
+            m = meta.pop(i)
+            _unlink_quiet(m.pop("tmp", None))
+            if err and errors is not None:
+                errors.append(f"{m['source']}: {err}")
+            for d in dois_info:
+                d.update(m)
+            yield m["source"], dois_info
+    finally:
+        results.close()
+        for m in meta.values():
+            _unlink_quiet(m.get("tmp"))
+
+
+# =========================================================
+# Salida en streaming
+# =========================================================
+def result_row(d: Dict[str, Any], result=None, crossref=None) -> Dict[str, Any]:
+    """Fila de salida (`ROW_FIELDS`) a partir de la info extraída, el veredicto doi.org
+    `(doi, ok, category, status, message, time)` y el título Crossref `(title, source)`."""
+    page = d.get("page")
+    row = {
+        "source": d.get("source"),
+        "file_name": d.get("file_name"),
+        "page": page if isinstance(page, int) else None,
+        "doi": d.get("doi"),
+        "pattern": d.get("pattern"),
+        "reference_line": d.get("reference_line") or "",
+        "figshare_id": d.get("figshare_id"),
+        "figshare_url": d.get("figshare_url"),
+        "pdf_url": d.get("pdf_url"),
+        "ok": None,
+        "category": None,
+        "status": None,
+        "message": None,
+        "time": None,
+        "crossref_title": None,
+        "crossref_source": None,
+    }
+    if result is not None:
+        _doi, ok, category, status, message, rt = result
+        row.update(ok=bool(ok), category=category, status=int(status or 0), message=message, time=float(rt or 0.0))
+    if crossref is not None:
+        row.update(crossref_title=crossref[0], crossref_source=crossref[1])
+    return row
+
+
+def open_writer(path: str, fmt: Optional[str] = None) -> ChunkedWriter:
+    """Escritor por bloques de `src.reporting` con las columnas de `ROW_FIELDS`."""
+    columns = [name for name, _kind in ROW_FIELDS]
+    if path == "-":
+        # JSONL por stdout, fila a fila para poder encadenarlo con otras herramientas
+        return JsonlChunkWriter(sys.stdout, columns, chunk_size=1)
+    fmt = fmt or export_format(path)
+    if fmt == "parquet":
+        if pa is None:
+            raise RuntimeError("La salida Parquet requiere pyarrow (pip install pyarrow)")
+        schema = pa.schema([(name, pa.type_for_alias(kind)) for name, kind in ROW_FIELDS])
+        return ParquetChunkWriter(path, columns, chunk_size=5000, schema=schema)
+    return open_chunk_writer(path, fmt, columns=columns, chunk_size=1000)
+
+
+# =========================================================
+# Ejecución
+# =========================================================
+def run_batch(
+    out_path: str,
+    pdf_specs: Iterable[str] = (),
+    figshare_ids: Iterable[int] = (),
+    doi_lists: Iterable[str] = (),
+    fmt: Optional[str] = None,
+    validate: bool = True,
+    crossref: bool = False,
+    workers: int = 10,
+    pdf_workers: Optional[int] = None,
+    download_workers: int = 4,
+    mode: str = "refs",
+    max_pages_from_end: int = 10,
+    backend: str = "auto",
+    timeout_sec: float = 15.0,
+    retries: int = 2,
+    cache_size: int = 50_000,
+    log=lambda msg: print(msg, file=sys.stderr),
+) -> Dict[str, Any]:
+    """Extracción + validación sin interfaz, con la salida escrita fila a fila.
+
+    Una fila por DOI y archivo (sin deduplicar entre fuentes); un DOI repetido se
+    resuelve con la caché en memoria (acotada a `cache_size`) o con el almacén
+    SQLite persistente, así que la memoria no crece con el tamaño del corpus.
+    """
+    errors: List[str] = []
+    extract_cache = ExtractionCache()
+
+    def sources():
+        yield from iter_doi_lists(doi_lists)
+        yield from iter_pdf_sources(
+            pdf_specs,
+            figshare_ids,
+            pdf_workers=pdf_workers,
+            mode=mode,
+            max_pages_from_end=max_pages_from_end,
+            backend=backend,
+            download_workers=download_workers,
+            timeout_sec=max(timeout_sec, 60.0),
+            cache=extract_cache,
+            errors=errors,
+        )
+
+    writer = open_writer(out_path, fmt)
+    counts: Counter = Counter()
+    n_sources = n_rows = 0
+    t0 = last_log = time.monotonic()
+
+    def progress(force: bool = False) -> None:
+        nonlocal last_log
+        now = time.monotonic()
+        if force or now - last_log >= 10.0:
+            last_log = now
+            log(f"fuentes {n_sources} | filas {n_rows} | errores {len(errors)} | {now - t0:.0f} s")
+
+    try:
+        if not validate:
+            for source, rows in sources():
+                n_sources += 1
+                for d in rows:
+                    writer.write(result_row(dict(d, source=d.get("source", source))))
+                    n_rows += 1
+                progress()
+        else:
+            registry = PrefixRegistry.load(default_prefixes_path())
+            resolver = DOIResolver(
+                timeout=timeout_sec, max_retries=retries, pool_size=int(workers), prefixes=registry
+            )
+            store = ValidationStore()
+            cache = SingleFlightCache(max_size=cache_size)
+
+            def prefetched():
+                for source, rows in sources():
+                    # lectura masiva del almacén persistente antes de validar la fuente
+                    cache.update(store.get_results(d["doi"] for d in rows if doi_key(d["doi"]) not in cache))
+                    for d in rows:
+                        d.setdefault("source", source)
+                    yield source, rows
+
+            def _validate(doi: str):
+                fresh = doi_key(doi) not in cache
+                res = resolver.validate(doi, cache=cache)
+                if fresh:
+                    store.put_result(*res)
+                return res
+
+            def _enrich(dois: List[str]):
+                found = store.get_crossref(dois)
+                missing = [d for d in dois if doi_key(d) not in found]
+                for key, (title, src) in crossref_titles_by_dois(missing, timeout=timeout_sec).items():
+                    found[key] = (title, src)
+                    store.put_crossref(key, title, src)
+                return {doi_key(d): found.get(doi_key(d), (None, None)) for d in dois}
+
+            try:
+                for ev in run_pipeline(
+                    prefetched(),
+                    _validate,
+                    enrich=_enrich if crossref else None,
+                    validate_workers=int(workers),
+                    dedupe=False,
+                ):
+                    if ev["type"] == "source":
+                        n_sources += 1
+                    elif ev["type"] == "result":
+                        writer.write(result_row(ev["info"], ev["result"], ev["crossref"]))
+                        counts[ev["result"][2]] += 1
+                        n_rows += 1
+                    elif ev["type"] == "error":
+                        errors.append(f"{ev['stage']}: {ev['error']}")
+                    progress()
+            finally:
+                store.close()
+                resolver.close()
+                if registry.dirty:
+                    registry.save(default_prefixes_path())
+    finally:
+        writer.close()
+        extract_cache.close()
+
+    progress(force=True)
+    for err in errors[:50]:
+        log(f"  error: {err}")
+    return {
+        "sources": n_sources,
+        "rows": n_rows,
+        "categories": dict(counts),
+        "errors": len(errors),
+        "seconds": round(time.monotonic() - t0, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(
+        description="Extracción y validación de DOIs por lotes, sin interfaz: PDFs locales, Figshare o listas de DOIs."
+    )
+    ap.add_argument("inputs", nargs="*", help="Directorios (recursivo), PDFs o patrones glob (entre comillas)")
+    ap.add_argument("--figshare", type=int, nargs="+", default=[], metavar="ID", help="IDs de artículos Figshare")
+    ap.add_argument("--figshare-file", default=None, help="Archivo con un ID de Figshare por línea")
+    ap.add_argument("--dois", action="append", default=[], metavar="FILE", help="Lista de DOIs (repetible; '-' = stdin)")
+    ap.add_argument("--out", required=True, help="Salida .jsonl, .csv o .parquet ('-' = JSONL por stdout)")
+    ap.add_argument("--format", choices=["jsonl", "csv", "parquet"], default=None, help="Por defecto, según la extensión")
+    ap.add_argument("--no-validate", action="store_true", help="Solo extraer (sin doi.org)")
+    ap.add_argument("--crossref", action="store_true", help="Añadir título Crossref por DOI")
+    ap.add_argument("--workers", type=int, default=10, help="Hilos de validación")
+    ap.add_argument("--pdf-workers", type=int, default=None, help="Procesos de extracción (por defecto, uno por núcleo)")
+    ap.add_argument("--download-workers", type=int, default=4)
+    ap.add_argument("--mode", default="refs", choices=["refs", "tail", "full"])
+    ap.add_argument("--pages", type=int, default=10, help="Páginas desde el final (modo tail / respaldo de refs)")
+    ap.add_argument("--backend", default="auto")
+    ap.add_argument("--timeout", type=float, default=15.0)
+    ap.add_argument("--retries", type=int, default=2)
+    args = ap.parse_args(argv)
+
+    figshare_ids = list(args.figshare)
+    if args.figshare_file:
+        with open(args.figshare_file, encoding="utf-8") as fh:
+            figshare_ids += [int(ln) for ln in (ln.strip() for ln in fh) if ln.isdigit()]
+    if not (args.inputs or figshare_ids or args.dois):
+        ap.error("indica al menos un directorio/PDF/glob, --figshare o --dois")
+
+    summary = run_batch(
+        args.out,
+        pdf_specs=args.inputs,
+        figshare_ids=figshare_ids,
+        doi_lists=args.dois,
+        fmt=args.format,
+        validate=not args.no_validate,
+        crossref=args.crossref,
+        workers=args.workers,
+        pdf_workers=args.pdf_workers,
+        download_workers=args.download_workers,
+        mode=args.mode,
+        max_pages_from_end=args.pages,
+        backend=args.backend,
+        timeout_sec=args.timeout,
+        retries=args.retries,
+    )
+    print(json.dumps(summary, ensure_ascii=False, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark del extractor de DOIs de una sola pasada (`scan_dois`) frente a
+`extract_dois_from_text` (cinco regex) y `extract_dois_robust` (normalización + regex).
+
+    python bench_doi_scan.py --refs 20000 --repeat 3
+
+Genera una bibliografía sintética (DOIs con etiqueta, URL, entre corchetes,
+cortados tras un guion y con espacios junto a "/") y muestra tiempo, MB/s y
+cuántos DOIs encuentra cada función, además de las diferencias con `scan_dois`.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from documento import extract_dois_robust
+from src.doi_extract import extract_dois_from_text, scan_dois
+
+_FORMS = [
+    "doi: {doi}.",
+    "https://doi.org/{doi}",
+    "[{doi}]",
+    "DOI {doi}",
+    "({doi})",
+    "Available at {doi}, accessed 2020.",
+]
+
+
+def synthetic_text(n_refs: int, seed: int = 7) -> str:
+    rnd = random.Random(seed)
+    lines: List[str] = []
+    for i in range(n_refs):
+        prefix = f"10.{rnd.randint(1000, 99999)}"
+        suffix = f"j.{rnd.choice(['cell', 'nar', 'jbc', 'pone'])}.{2000 + i % 24}.{i:06d}"
+        authors = ", ".join(f"Autor{rnd.randint(1, 999)} A." for _ in range(rnd.randint(1, 4)))
+        body = f"{authors} ({2000 + i % 24}). Título del trabajo número {i} sobre un tema cualquiera. Revista {i % 50}, {i % 30}({i % 12}), {i % 300}-{i % 300 + 12}."
+        kind = i % 8
+        if kind == 6:
+            # corte de línea tras un guion del sufijo
+            doi_text = f"doi: {prefix}/s{i:05d}-020-\n{i % 1000:04d}-7"
+        elif kind == 7:
+            doi_text = f"{prefix} / {suffix}"
+        else:
+            doi_text = _FORMS[kind].format(doi=f"{prefix}/{suffix}")
+        lines.append(f"{body} {doi_text}")
+    return "\n".join(lines)
+
+
+def _bench(fn: Callable[[str], List[Dict]], text: str, repeat: int) -> Dict[str, float]:
+    best: Optional[float] = None
+    found: List[Dict] = []
+    for _ in range(max(1, int(repeat))):
+        t0 = time.perf_counter()
+        found = fn(text)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    mb = len(text.encode("utf-8")) / (1 << 20)
+    return {"seconds": best or 0.0, "mb_s": mb / max(best or 0.0, 1e-9), "found": found}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--refs", type=int, default=20000, help="Referencias sintéticas a generar")
+    ap.add_argument("--repeat", type=int, default=3, help="Repeticiones (se informa la mejor)")
+    args = ap.parse_args(argv)
+
+    text = synthetic_text(args.refs)
+    print(f"Texto: {len(text) / (1 << 20):.1f} MB, {args.refs} referencias")
+
+    results = {}
+    for name, fn in (
+        ("scan_dois", scan_dois),
+        ("extract_dois_from_text", extract_dois_from_text),
+        ("extract_dois_robust", extract_dois_robust),
+    ):
+        r = results[name] = _bench(fn, text, args.repeat)
+        print(f"{name:<24} {r['seconds']:8.3f} s  {r['mb_s']:7.1f} MB/s  {len(r['found']):7d} DOIs")
+
+    base = {d["doi"].lower() for d in results["scan_dois"]["found"]}
+    for name in ("extract_dois_from_text", "extract_dois_robust"):
+        other = {d["doi"].lower() for d in results[name]["found"]}
+        print(
+            f"{name:<24} speed-up x{results[name]['seconds'] / max(results['scan_dois']['seconds'], 1e-9):.1f}"
+            f"  solo en scan_dois: {len(base - other)}  solo en {name}: {len(other - base)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from documento import (
+    FIGSHARE_BASE,
+    get_figshare_session,
+    harvest_figshare,
+    process_pdfs_parallel,
+)
+from src.extract_cache import ExtractionCache
+from src.resolver import DOIResolver
+from src.singleflight import SingleFlightCache
+from src.store import ValidationStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    published_date TEXT,
+    modified_date TEXT,
+    status TEXT NOT NULL,
+    n_pdfs INTEGER NOT NULL DEFAULT 0,
+    n_dois INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Estados por artículo
+PENDING = "pending"
+DONE = "done"
+NO_PDF = "no_pdf"
+ERROR = "error"
+
+
+def default_state_path() -> str:
+    return os.environ.get("CRAWL_STATE_PATH") or os.path.join(
+        os.path.expanduser("~"), ".cache", "doi_validator", "crawl_state.sqlite3"
+    )
+
+
+# =========================================================
+# Estado persistente (marcas de agua + estado por artículo)
+# =========================================================
+class CrawlState:
+    """Estado del crawler en SQLite: marcas de agua de fecha publicada/modificada
+    y un checkpoint por artículo (se escribe al terminar cada uno, así una
+    ejecución interrumpida retoma sin repetir lo ya procesado).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_state_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def get_watermark(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM watermarks WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, name: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?)", (name, value))
+
+    def needs_processing(self, article: Dict[str, Any]) -> bool:
+        """Nuevo, modificado desde la última vez o sin terminar (pendiente / error)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT modified_date, status FROM articles WHERE id = ?", (int(article["id"]),)
+            ).fetchone()
+        if row is None:
+            return True
+        modified, status = row
+        return status not in (DONE, NO_PDF) or (article.get("modified_date") or "") > (modified or "")
+
+    def mark(self, article: Dict[str, Any], status: str, n_pdfs: int = 0, n_dois: int = 0, error: str = "") -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?,?,?,?,?,?,?,?,?)",
+                (
+                    int(article["id"]),
+                    article.get("title"),
+                    article.get("published_date"),
+                    article.get("modified_date"),
+                    status,
+                    int(n_pdfs),
+                    int(n_dois),
+                    error or None,
+                    time.time(),
+                ),
+            )
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Artículos pendientes o con error de pasadas anteriores (ya fuera de la marca de agua)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, title, published_date, modified_date FROM articles WHERE status IN (?, ?)",
+                (PENDING, ERROR),
+            ).fetchall()
+        return [{"id": i, "title": t, "published_date": p, "modified_date": m} for i, t, p, m in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM articles GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# =========================================================
+# Listado incremental con prefetch de páginas
+# =========================================================
+def iter_article_pages(
+    params: Dict[str, Any],
+    session: Optional[requests.Session] = None,
+    page_size: int = 500,
+    prefetch: int = 4,
+    timeout_sec: float = 30.0,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Páginas de `GET /articles` en orden, con hasta `prefetch` páginas pedidas por adelantado.
+    Termina en la primera página incompleta, vacía o con error HTTP.
+    """
+    s = session or get_figshare_session()
+
+    def fetch(page: int) -> List[Dict[str, Any]]:
+        q = dict(params, page=page, page_size=int(page_size))
+        r = s.get(f"{FIGSHARE_BASE}/articles", params=q, timeout=float(timeout_sec))
+        if r.status_code >= 400:
+            return []
+        batch = r.json() or []
+        return batch if isinstance(batch, list) else []
+
+    with ThreadPoolExecutor(max_workers=max(1, int(prefetch)), thread_name_prefix="figshare-list") as ex:
+        window: List[Future] = [ex.submit(fetch, p) for p in range(1, int(prefetch) + 1)]
+        next_page = int(prefetch) + 1
+        try:
+            while window:
+                batch = window.pop(0).result()
+                if batch:
+                    yield batch
+                if len(batch) < int(page_size):
+                    break
+                window.append(ex.submit(fetch, next_page))
+                next_page += 1
+        finally:
+            for fut in window:
+                fut.cancel()
+
+
+def _day(date: Optional[str]) -> str:
+    return (date or "")[:10]
+
+
+def list_changed_articles(
+    state: CrawlState,
+    item_types: Iterable[int] = (3,),
+    institution: Optional[int] = None,
+    group: Optional[int] = None,
+    since: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    page_size: int = 500,
+    prefetch: int = 4,
+    timeout_sec: float = 30.0,
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """Artículos publicados o modificados desde las marcas de agua (o `since` en la primera ejecución),
+    más los que quedaron pendientes o con error en pasadas anteriores.
+
+    Returns: (artículos a procesar según el estado por artículo, nuevas marcas de agua)
+    Las marcas se guardan aparte (`state.set_watermark`) cuando termina la ejecución.
+    """
+    found: Dict[int, Dict[str, Any]] = {}
+    marks: Dict[str, str] = {}
+    for field in ("published", "modified"):
+        mark = state.get_watermark(field) or since
+        marks[field] = mark or ""
+        for item_type in item_types:
+            params: Dict[str, Any] = {
+                "item_type": int(item_type),
+                "order": f"{field}_date",
+                "order_direction": "asc",
+            }
+            if mark:
+                # granularidad de día: los artículos del mismo día ya vistos se descartan por estado
+                params[f"{field}_since"] = _day(mark)
+            if institution is not None:
+                params["institution"] = int(institution)
+            if group is not None:
+                params["group"] = int(group)
+            for batch in iter_article_pages(params, session, page_size, prefetch, timeout_sec):
+                for art in batch:
+                    if "id" not in art:
+                        continue
+                    found[int(art["id"])] = art
+                    date = art.get(f"{field}_date") or ""
+                    if date > marks[field]:
+                        marks[field] = date
+    todo = [a for a in found.values() if state.needs_processing(a)]
+    todo += [a for a in state.unfinished() if int(a["id"]) not in found]
+    todo.sort(key=lambda a: a.get("published_date") or "")
+    return todo, {k: v for k, v in marks.items() if v}
+
+
+# =========================================================
+# Ejecución
+# =========================================================
+def crawl(
+    state: CrawlState,
+    out_path: str,
+    item_types: Iterable[int] = (3,),
+    institution: Optional[int] = None,
+    group: Optional[int] = None,
+    since: Optional[str] = None,
+    max_articles: Optional[int] = None,
+    download_workers: int = 4,
+    pdf_workers: Optional[int] = None,
+    mode: str = "refs",
+    max_pages_from_end: int = 10,
+    backend: str = "auto",
+    validate: bool = False,
+    validate_workers: int = 10,
+    prefetch: int = 4,
+    timeout_sec: float = 60.0,
+    log=print,
+) -> Dict[str, Any]:
+    """Una pasada incremental: lista cambios, descarga y extrae los PDFs, valida
+    (opcional) y añade una fila JSONL por DOI a `out_path`.
+    Cada artículo se marca en el estado al terminar; las marcas de agua solo
+    avanzan si la pasada llega al final.
+    """
+    articles, marks = list_changed_articles(
+        state, item_types, institution, group, since, prefetch=prefetch, timeout_sec=min(30.0, timeout_sec)
+    )
+    # todo lo listado queda pendiente: lo que no entre por `max_articles` se retoma en la próxima pasada
+    for a in articles:
+        state.mark(a, PENDING)
+    if max_articles is not None:
+        articles = articles[: int(max_articles)]
+    log(f"{len(articles)} artículos nuevos, modificados o pendientes")
+    by_id = {int(a["id"]): a for a in articles}
+
+    resolver = DOIResolver() if validate else None
+    store = ValidationStore() if validate else None
+    doi_cache = SingleFlightCache()
+
+    # por artículo: PDFs esperados, PDFs terminados, DOIs y errores
+    progress: Dict[int, Dict[str, Any]] = {}
+    meta: List[Dict[str, Any]] = []
+
+    def pdf_inputs():
+        for fmeta, path, err in harvest_figshare(list(by_id), workers=download_workers, timeout_sec=timeout_sec):
+            aid = int(fmeta["figshare_id"])
+            p = progress.setdefault(aid, {"expected": fmeta["n_pdfs"], "done": 0, "dois": 0, "errors": []})
+            if path is None:
+                if fmeta["n_pdfs"] == 0:
+                    state.mark(by_id[aid], NO_PDF if err == "sin PDF" else ERROR, error=err or "")
+                    log(f"  {aid}: {err}")
+                    continue
+                p["errors"].append(err)
+                finish(aid)
+                continue
+            meta.append(dict(fmeta, tmp=path))
+            yield path, f"{fmeta['title']} · {fmeta['pdf_name']}"
+
+    def finish(aid: int) -> None:
+        p = progress[aid]
+        p["done"] += 1
+        if p["done"] < p["expected"]:
+            return
+        status = ERROR if p["errors"] else DONE
+        state.mark(by_id[aid], status, n_pdfs=p["expected"], n_dois=p["dois"], error="; ".join(p["errors"]))
+        log(f"  {aid}: {status} ({p['dois']} DOIs en {p['expected']} PDF)")
+
+    n_rows = 0
+    cache = ExtractionCache()
+    try:
+        with open(out_path, "a", encoding="utf-8") as out:
+            for i, _name, dois_info, _refs, info, err in process_pdfs_parallel(
+                pdf_inputs(),
+                workers=pdf_workers,
+                mode=mode,
+                max_pages_from_end=max_pages_from_end,
+                backend=backend,
+                cache=cache,
+            ):
+                m = meta[i]
+                try:
+                    os.unlink(m.pop("tmp"))
+                except OSError:
+                    pass
+                aid = int(m["figshare_id"])
+                results: Dict[str, Tuple] = {}
+                if resolver is not None and dois_info:
+                    for res in resolver.validate_many([d["doi"] for d in dois_info], validate_workers, doi_cache):
+                        results[res[0]] = res
+                        store.put_result(*res)
+                for d in dois_info:
+                    res = results.get(d["doi"])
+                    row = {
+                        "figshare_id": aid,
+                        "figshare_url": m["figshare_url"],
+                        "pdf_url": m["pdf_url"],
+                        "file_name": d.get("file_name"),
+                        "doi": d["doi"],
+                        "position": d.get("position"),
+                        "page": d.get("page"),
+                        "reference_line": d.get("reference_line") or "",
+                        "backend": info.get("backend"),
+                    }
+                    if res is not None:
+                        row.update(ok=res[1], category=res[2], status=res[3], message=res[4])
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    n_rows += 1
+                out.flush()
+                p = progress[aid]
+                p["dois"] += len(dois_info)
+                if err:
+                    p["errors"].append(err)
+                finish(aid)
+    finally:
+        cache.close()
+        if store is not None:
+            store.close()
+        if resolver is not None:
+            resolver.close()
+
+    # solo avanzan si la pasada terminó; lo que quedó en error se reintenta por estado
+    for name, value in marks.items():
+        state.set_watermark(name, value)
+    return {"articles": len(articles), "rows": n_rows, "states": state.counts(), "watermarks": marks}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(
+        description="Auditoría incremental de un repositorio Figshare: solo artículos nuevos o modificados desde la última ejecución."
+    )
+    ap.add_argument("--out", required=True, help="Archivo JSONL de salida (se añade una fila por DOI)")
+    ap.add_argument("--state", default=default_state_path(), help="Base SQLite de estado (marcas de agua + checkpoints)")
+    ap.add_argument("--institution", type=int, default=None)
+    ap.add_argument("--group", type=int, default=None)
+    ap.add_argument("--item-type", type=int, action="append", default=None, help="Tipo Figshare (repetible; por defecto 3)")
+    ap.add_argument("--since", default=None, help="Fecha inicial YYYY-MM-DD si aún no hay marcas de agua")
+    ap.add_argument("--max-articles", type=int, default=None)
+    ap.add_argument("--download-workers", type=int, default=4)
+    ap.add_argument("--pdf-workers", type=int, default=None)
+    ap.add_argument("--mode", default="refs", choices=["refs", "tail", "full"])
+    ap.add_argument("--pages", type=int, default=10, help="Páginas desde el final (modo tail / respaldo de refs)")
+    ap.add_argument("--backend", default="auto")
+    ap.add_argument("--validate", action="store_true", help="Validar cada DOI contra doi.org")
+    ap.add_argument("--prefetch", type=int, default=4, help="Páginas del listado pedidas por adelantado")
+    args = ap.parse_args(argv)
+
+    state = CrawlState(args.state)
+    try:
+        summary = crawl(
+            state,
+            args.out,
+            item_types=args.item_type or (3,),
+            institution=args.institution,
+            group=args.group,
+            since=args.since,
+            max_articles=args.max_articles,
+            download_workers=args.download_workers,
+            pdf_workers=args.pdf_workers,
+            mode=args.mode,
+            max_pages_from_end=args.pages,
+            backend=args.backend,
+            validate=args.validate,
+            prefetch=args.prefetch,
+        )
+    finally:
+        state.close()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import os
 import re
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from io import BytesIO
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import requests
 from requests.adapters import HTTPAdapter
@@ -19,9 +25,12 @@ try:
 except Exception as e:  # pragma: no cover
     PdfReader = None  # type: ignore
 
-from src.pdf_extract import normalize_text
-from src.references import slice_references_section, extract_reference_lines
-from src.doi_extract import clean_doi, is_valid_doi_format
+from src.pdf_extract import PdfSource, count_pages, extract_pages, get_pdf_pool, normalize_text
+from src.references import ReferenceLineIndex, slice_references_section, extract_reference_lines
+from src.ref_locator import extract_reference_pages
+from src.extract_cache import ExtractionCache, content_digest, extraction_key, open_extract_cache
+from src.doi_extract import clean_doi, is_valid_doi_format, scan_dois
+from src.doc_text import DocumentText
 
 FIGSHARE_BASE = "https://api.figshare.com/v2"
 
@@ -46,14 +55,29 @@ def session_with_retries(total: int = 6, backoff_factor: float = 0.5) -> request
     return s
 
 
+_figshare_session: Optional[requests.Session] = None
+_figshare_lock = threading.Lock()
+
+
+def get_figshare_session() -> requests.Session:
+    """Sesión compartida por el proceso (un único pool keep-alive para API y descargas)."""
+    global _figshare_session
+    with _figshare_lock:
+        if _figshare_session is None:
+            _figshare_session = session_with_retries()
+        return _figshare_session
+
+
 # =========================================================
 # Figshare API
 # =========================================================
-def figshare_list_theses(limit: int = 50, timeout_sec: float = 30.0) -> List[Dict[str, Any]]:
+def figshare_list_theses(
+    limit: int = 50, timeout_sec: float = 30.0, session: Optional[requests.Session] = None
+) -> List[Dict[str, Any]]:
     """Lista tesis (o artículos tipo tesis) desde Figshare con paginación.
     Intenta item_type=3 y luego 8 para compatibilidad.
     """
-    s = session_with_retries()
+    s = session or get_figshare_session()
     page_size = 50
 
     for item_type in (3, 8):
@@ -82,8 +106,10 @@ def figshare_list_theses(limit: int = 50, timeout_sec: float = 30.0) -> List[Dic
     return []
 
 
-def figshare_article_detail(article_id: int, timeout_sec: float = 30.0) -> Optional[Dict[str, Any]]:
-    s = session_with_retries()
+def figshare_article_detail(
+    article_id: int, timeout_sec: float = 30.0, session: Optional[requests.Session] = None
+) -> Optional[Dict[str, Any]]:
+    s = session or get_figshare_session()
     try:
         r = s.get(f"{FIGSHARE_BASE}/articles/{int(article_id)}", timeout=float(timeout_sec))
         if r.status_code >= 400:
@@ -94,46 +120,209 @@ def figshare_article_detail(article_id: int, timeout_sec: float = 30.0) -> Optio
         return None
 
 
-def figshare_extract_pdf_urls(detail: Dict[str, Any]) -> List[str]:
+def figshare_extract_pdf_files(detail: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Archivos PDF del artículo (entradas de `files`: `download_url`, `name`, `size`...)."""
     files = (detail or {}).get("files", []) or []
-    pdfs: List[str] = []
+    pdfs: List[Dict[str, Any]] = []
     for f in files:
         url = f.get("download_url")
         name = (f.get("name") or "").lower()
         mime = (f.get("mime_type") or "").lower()
         if url and (name.endswith(".pdf") or mime == "application/pdf"):
-            pdfs.append(url)
+            pdfs.append(f)
     return pdfs
 
 
-def figshare_download_pdf_bytes(url: str, timeout_sec: float = 60.0) -> bytes:
-    s = session_with_retries()
+def figshare_extract_pdf_urls(detail: Dict[str, Any]) -> List[str]:
+    return [f["download_url"] for f in figshare_extract_pdf_files(detail)]
+
+
+def figshare_download_pdf_bytes(
+    url: str, timeout_sec: float = 60.0, session: Optional[requests.Session] = None
+) -> bytes:
+    s = session or get_figshare_session()
     r = s.get(url, timeout=float(timeout_sec))
     r.raise_for_status()
     return r.content
 
 
+# Tamaño de bloque para descargas y copias a disco (memoria pico por documento)
+_SPOOL_CHUNK = 1 << 20
+
+
+def spool_to_tempfile(fileobj, suffix: str = ".pdf", dir: Optional[str] = None) -> str:
+    """Copia un archivo abierto (p. ej. `UploadedFile`) a un temporal en disco por bloques.
+    Devuelve la ruta; el llamador la borra (`os.unlink`) al terminar.
+    """
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=dir)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            shutil.copyfileobj(fileobj, fh, _SPOOL_CHUNK)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def figshare_download_pdf_to_tempfile(
+    url: str,
+    timeout_sec: float = 60.0,
+    session: Optional[requests.Session] = None,
+    dir: Optional[str] = None,
+) -> str:
+    """Descarga en streaming a un temporal en disco (memoria acotada a un bloque).
+    Devuelve la ruta; el llamador la borra (`os.unlink`) al terminar.
+    """
+    s = session or get_figshare_session()
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=dir)
+    try:
+        with os.fdopen(fd, "wb") as fh, s.get(url, timeout=float(timeout_sec), stream=True) as r:
+            r.raise_for_status()
+            for chunk in r.iter_content(chunk_size=_SPOOL_CHUNK):
+                fh.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+# =========================================================
+# Figshare: cosecha concurrente (detalles + descargas)
+# =========================================================
+# (metadatos del archivo, ruta temporal o None, error o None)
+HarvestItem = Tuple[Dict[str, Any], Optional[str], Optional[str]]
+
+
+def harvest_figshare(
+    article_ids: Iterable[int],
+    workers: int = 4,
+    timeout_sec: float = 60.0,
+    session: Optional[requests.Session] = None,
+    dir: Optional[str] = None,
+) -> Iterator[HarvestItem]:
+    """Descarga todos los PDFs de varios artículos Figshare con una sola sesión.
+
+    Los detalles se piden en paralelo (hasta `workers`) y cada PDF encontrado
+    se descarga en streaming a un temporal, con a lo sumo `workers` descargas
+    en vuelo. Produce `(meta, path, error)` en orden de finalización, con meta =
+    `{"figshare_id", "figshare_url", "title", "pdf_url", "pdf_name", "n_pdfs"}`;
+    un artículo sin PDFs (o cuyo detalle falla) produce `path=None` y `error`.
+    Las rutas entregadas las borra el consumidor; las no entregadas (generador
+    cerrado antes de tiempo) se borran aquí.
+    """
+    s = session or get_figshare_session()
+    n = max(1, int(workers))
+    ids = list(dict.fromkeys(int(a) for a in article_ids))
+    details_ex = ThreadPoolExecutor(max_workers=n, thread_name_prefix="figshare-detail")
+    downloads_ex = ThreadPoolExecutor(max_workers=n, thread_name_prefix="figshare-download")
+    details: Dict[Future, int] = {
+        details_ex.submit(figshare_article_detail, aid, timeout_sec, s): aid for aid in ids
+    }
+    downloads: Dict[Future, Dict[str, Any]] = {}
+    todo: "deque[Dict[str, Any]]" = deque()
+    try:
+        while details or downloads or todo:
+            while todo and len(downloads) < n:
+                meta = todo.popleft()
+                fut = downloads_ex.submit(figshare_download_pdf_to_tempfile, meta["pdf_url"], timeout_sec, s, dir)
+                downloads[fut] = meta
+            done, _ = wait(list(details) + list(downloads), return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut in details:
+                    aid = details.pop(fut)
+                    detail = fut.result() or {}
+                    files = figshare_extract_pdf_files(detail)
+                    base = {
+                        "figshare_id": aid,
+                        "figshare_url": detail.get("figshare_url") or "",
+                        "title": detail.get("title") or f"Figshare id:{aid}",
+                        "n_pdfs": len(files),
+                    }
+                    if not files:
+                        yield dict(base, pdf_url="", pdf_name=""), None, ("sin detalle" if not detail else "sin PDF")
+                    for f in files:
+                        todo.append(dict(base, pdf_url=f["download_url"], pdf_name=f.get("name") or ""))
+                    continue
+                meta = downloads.pop(fut)
+                try:
+                    path = fut.result()
+                except Exception as e:
+                    yield meta, None, f"{type(e).__name__}: {e}"
+                    continue
+                yield meta, path, None
+    finally:
+        for fut in list(details) + list(downloads):
+            fut.cancel()
+        details_ex.shutdown(wait=False)
+        downloads_ex.shutdown(wait=True)
+        for fut in downloads:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                os.unlink(fut.result())
+
+
 # =========================================================
 # PDF text extraction
 # =========================================================
-def extract_text_from_pdf_bytes(pdf_bytes: bytes, mode: str = "tail", max_pages_from_end: int = 10) -> str:
+def extract_pdf_text(
+    pdf_bytes: PdfSource,
+    mode: str = "tail",
+    max_pages_from_end: int = 10,
+    backend: str = "auto",
+    page_workers: Optional[int] = None,
+    shard_threshold: Optional[int] = None,
+) -> Tuple[DocumentText, Dict[str, Any]]:
+    """Texto del PDF (normalizado, con la página de cada posición) más `info` de
+    extracción (`backend`, `pages`, `seconds`, `ms_per_page`, `fallback`).
+    mode: 'tail' (últimas N páginas), 'full' (todo) o 'refs' (solo las páginas de la
+    bibliografía, localizadas por marcadores o barrido hacia atrás; si no se
+    encuentran, las últimas N páginas). Ver `src.ref_locator.extract_reference_pages`.
+    `backend`: ver `src.pdf_extract.extract_pages` ("auto" = motor rápido con respaldo pdfplumber).
+    Rangos de al menos `shard_threshold` páginas se reparten en tramos entre `page_workers` procesos.
+    """
+    if mode == "refs":
+        parts, info = extract_reference_pages(
+            pdf_bytes,
+            backend=backend,
+            fallback_pages=int(max_pages_from_end),
+            workers=page_workers,
+            shard_threshold=shard_threshold,
+        )
+        return DocumentText.from_pages(parts, info["page_range"][0] + 1, normalized=True), info
+
+    start = 0
+    if mode != "full":
+        start = max(0, count_pages(pdf_bytes, backend) - int(max_pages_from_end))
+    parts, info = extract_pages(
+        pdf_bytes, start=start, backend=backend, workers=page_workers, shard_threshold=shard_threshold
+    )
+    return DocumentText.from_pages(parts, start + 1, normalized=True), info
+
+
+def extract_text_from_pdf_bytes(
+    pdf_bytes: PdfSource,
+    mode: str = "tail",
+    max_pages_from_end: int = 10,
+    page_workers: Optional[int] = None,
+    shard_threshold: Optional[int] = None,
+    backend: str = "auto",
+) -> str:
     """Extrae texto del PDF.
-    mode: 'tail' (últimas N páginas) o 'full' (todo).
-    Preferencia: pdfplumber si está disponible, si no PyPDF2.
+    mode: 'tail' (últimas N páginas), 'full' (todo) o 'refs' (solo la bibliografía).
+    `backend`: "auto" usa el motor rápido disponible (PyMuPDF, pypdfium2 o pypdf) y
+    repite con pdfplumber si el texto parece degradado; también acepta un motor
+    concreto (ver `src.pdf_extract.available_backends`). Sin pdfplumber instalado,
+    lectura básica página a página con PyPDF2 ('refs' se trata como 'tail').
     """
     if pdfplumber is not None:
-        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-            pages = pdf.pages
-            chosen = pages if mode == "full" else (pages[-max_pages_from_end:] if len(pages) > max_pages_from_end else pages)
-            parts: List[str] = []
-            for p in chosen:
-                parts.append(normalize_text(p.extract_text() or ""))
-            return "\n".join(parts)
+        doc, _ = extract_pdf_text(pdf_bytes, mode, max_pages_from_end, backend, page_workers, shard_threshold)
+        return doc.text
 
     if PdfReader is None:
         return ""
 
-    reader = PdfReader(BytesIO(pdf_bytes))
+    reader = PdfReader(BytesIO(pdf_bytes) if isinstance(pdf_bytes, (bytes, bytearray)) else pdf_bytes)
     total = len(reader.pages)
     start = 0 if mode == "full" else max(0, total - int(max_pages_from_end))
     parts = []
@@ -188,7 +377,14 @@ def extract_dois_robust(text: str, max_context: int = 60) -> List[Dict[str, Any]
 # =========================================================
 # Helpers para referencias
 # =========================================================
-def find_reference_line_for_doi(doi: str, reference_lines: List[str]) -> Optional[str]:
+def find_reference_line_for_doi(
+    doi: str, reference_lines: Union[List[str], ReferenceLineIndex]
+) -> Optional[str]:
+    """Primera línea de referencia que contiene el DOI (sin distinguir mayúsculas ni espacios).
+    Para muchos DOIs del mismo documento, pasar un `ReferenceLineIndex` construido una vez.
+    """
+    if isinstance(reference_lines, ReferenceLineIndex):
+        return reference_lines.find(doi)
     doi_norm = re.sub(r"\s+", "", (doi or "").lower())
     if not doi_norm:
         return None
@@ -199,28 +395,214 @@ def find_reference_line_for_doi(doi: str, reference_lines: List[str]) -> Optiona
     return None
 
 
+def _rows_cache_key(digest: str, mode: str, max_pages_from_end: int, backend: str, prefer_refs_section: bool) -> str:
+    return extraction_key(
+        digest, "rows", mode=mode, pages=int(max_pages_from_end), backend=backend, refs=bool(prefer_refs_section)
+    )
+
+
+def _cached_rows(
+    hit: Dict[str, Any], file_name: str, stats: Optional[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    # el mismo documento puede llegar con otro nombre (re-subida, otra versión en Figshare)
+    for d in hit["rows"]:
+        d["file_name"] = file_name
+    if stats is not None:
+        stats.update(hit["info"], cached=True)
+    return hit["rows"], hit["reference_lines"]
+
+
 def process_pdf_bytes_to_doi_rows(
-    pdf_bytes: bytes,
+    pdf_bytes: PdfSource,
     file_name: str,
     mode: str = "tail",
     max_pages_from_end: int = 10,
     prefer_refs_section: bool = True,
+    page_workers: Optional[int] = None,
+    backend: str = "auto",
+    stats: Optional[Dict[str, Any]] = None,
+    cache: Optional[ExtractionCache] = None,
+    digest: Optional[str] = None,
 ) -> Tuple[List[Dict[str, Any]], List[str]]:
-    base_text = extract_text_from_pdf_bytes(pdf_bytes, mode=mode, max_pages_from_end=max_pages_from_end)
-    base_text = normalize_text(base_text or "")
-
-    if prefer_refs_section:
-        ref_text, _, _ = slice_references_section(base_text)
-        text_for_dois = ref_text or base_text
+    """`pdf_bytes` también puede ser una ruta (ver `process_pdf_path_to_doi_rows`).
+    `stats` (opcional) recibe la info de extracción: motor usado, páginas, tiempo por página.
+    Con `cache`, el texto y las filas se guardan bajo el hash del PDF (`digest`, se
+    calcula si no se pasa) + parámetros; un documento ya visto no se vuelve a parsear.
+    """
+    text_key = rows_key = None
+    if cache is not None:
+        digest = digest or content_digest(pdf_bytes)
+        rows_key = _rows_cache_key(digest, mode, max_pages_from_end, backend, prefer_refs_section)
+        hit = cache.get(rows_key)
+        if hit is not None:
+            return _cached_rows(hit, file_name, stats)
+        text_key = extraction_key(digest, "text", mode=mode, pages=int(max_pages_from_end), backend=backend)
+        hit = cache.get(text_key)
     else:
-        text_for_dois = base_text
+        hit = None
 
-    dois_info = extract_dois_robust(text_for_dois)
+    if hit is not None:
+        doc = DocumentText(hit["text"], hit["starts"], hit["first_page"])
+        info = dict(hit["info"], cached=True)
+    else:
+        doc, info = extract_pdf_text(
+            pdf_bytes, mode=mode, max_pages_from_end=max_pages_from_end, backend=backend, page_workers=page_workers
+        )
+        if cache is not None:
+            cache.put(text_key, {"text": doc.text, "starts": doc.starts, "first_page": doc.first_page, "info": info})
+    if stats is not None:
+        stats.update(info)
+
+    # un solo texto normalizado para todas las etapas; las filas llevan la página real del PDF
+    text_for_dois = slice_references_section(doc)[0] if prefer_refs_section else doc
+
+    dois_info = scan_dois(text_for_dois)
     reference_lines = extract_reference_lines(text_for_dois)
+    line_index = ReferenceLineIndex(reference_lines)
 
     for d in dois_info:
         d["file_name"] = file_name
-        d["page"] = "N/A"
-        d["reference_line"] = find_reference_line_for_doi(d["doi"], reference_lines) or ""
+        d["reference_line"] = find_reference_line_for_doi(d["doi"], line_index) or ""
 
+    if cache is not None:
+        cache.put(rows_key, {"rows": dois_info, "reference_lines": reference_lines, "info": info})
     return dois_info, reference_lines
+
+
+def process_pdf_path_to_doi_rows(
+    path: Union[str, "os.PathLike[str]"], file_name: Optional[str] = None, **kwargs: Any
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Como `process_pdf_bytes_to_doi_rows`, pero desde un archivo en disco: los
+    motores abren la ruta directamente (lectura bajo demanda, sin copiar el PDF
+    entero a memoria) y los workers de tramos de páginas reciben solo la ruta.
+    """
+    return process_pdf_bytes_to_doi_rows(os.fspath(path), file_name or os.path.basename(path), **kwargs)
+
+
+# =========================================================
+# Extracción en paralelo (pool de procesos)
+# =========================================================
+# (bytes del PDF o ruta en disco, nombre de archivo)
+PdfInput = Tuple[Union[bytes, str, "os.PathLike[str]"], str]
+# (índice de entrada, nombre, filas DOI, líneas de referencia, info de extracción, error o None)
+PdfResult = Tuple[int, str, List[Dict[str, Any]], List[str], Dict[str, Any], Optional[str]]
+
+
+def _process_pdf_input(
+    source: Union[bytes, str, "os.PathLike[str]"],
+    file_name: str,
+    kwargs: Dict[str, Any],
+    cache_path: Optional[str] = None,
+    cache_bytes: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], List[str], Dict[str, Any]]:
+    # una ruta viaja al worker como texto y se abre allí (sin copiar los bytes entre procesos)
+    source = bytes(source) if isinstance(source, (bytearray, memoryview)) else source
+    if not isinstance(source, bytes):
+        source = os.fspath(source)
+    if cache_path:
+        # en un worker: una conexión a la caché por proceso
+        kwargs = dict(kwargs, cache=open_extract_cache(cache_path, cache_bytes))
+    stats: Dict[str, Any] = {}
+    dois_info, reference_lines = process_pdf_bytes_to_doi_rows(source, file_name, stats=stats, **kwargs)
+    return dois_info, reference_lines, stats
+
+
+def process_pdfs_parallel(
+    inputs: Iterable[PdfInput],
+    workers: Optional[int] = None,
+    mode: str = "tail",
+    max_pages_from_end: int = 10,
+    prefer_refs_section: bool = True,
+    max_pending: Optional[int] = None,
+    backend: str = "auto",
+    cache: Optional[ExtractionCache] = None,
+) -> Iterator[PdfResult]:
+    """`process_pdf_bytes_to_doi_rows` sobre muchos PDFs en un pool de procesos.
+
+    `inputs` se consume de forma perezosa (p. ej. descargas) con a lo sumo
+    `max_pending` archivos en vuelo (por defecto 2 × workers), así que la memoria
+    no crece con el número de archivos. Produce `(i, file_name, dois_info,
+    reference_lines, info, error)` en orden de finalización; `i` es la posición
+    en `inputs` e `info` el motor y tiempo por página de la extracción. Un PDF
+    que falla produce listas vacías y el mensaje en `error`.
+    Con `workers=1` todo se ejecuta en el proceso actual.
+    Con `cache`, los aciertos se resuelven aquí mismo (solo se calcula el hash) y
+    los workers guardan lo que extraen en el mismo archivo de caché.
+    """
+    kwargs: Dict[str, Any] = {
+        "mode": mode,
+        "max_pages_from_end": int(max_pages_from_end),
+        "prefer_refs_section": bool(prefer_refs_section),
+        "backend": backend,
+    }
+    n = max(1, int(workers or os.cpu_count() or 1))
+
+    def cached(source, file_name: str) -> Tuple[Optional[str], Optional[Tuple]]:
+        if cache is None:
+            return None, None
+        digest = content_digest(source)
+        hit = cache.get(_rows_cache_key(digest, mode, max_pages_from_end, backend, prefer_refs_section))
+        if hit is None:
+            return digest, None
+        info: Dict[str, Any] = {}
+        dois_info, reference_lines = _cached_rows(hit, file_name, info)
+        return digest, (dois_info, reference_lines, info)
+
+    if n == 1:
+        if cache is not None:
+            kwargs["cache"] = cache
+        for i, (source, file_name) in enumerate(inputs):
+            try:
+                digest, hit = cached(source, file_name)
+                if hit is not None:
+                    yield (i, file_name, *hit, None)
+                    continue
+                dois_info, reference_lines, info = _process_pdf_input(source, file_name, dict(kwargs, digest=digest))
+                yield i, file_name, dois_info, reference_lines, info, None
+            except Exception as e:
+                yield i, file_name, [], [], {}, f"{type(e).__name__}: {e}"
+        return
+
+    # el paralelismo ya es por archivo: sin tramos de páginas anidados dentro de los workers
+    kwargs["page_workers"] = 1
+    # una caché ":memory:" solo sirve en este proceso: los workers extraen sin caché
+    cache_path = cache.path if cache is not None and cache.path != ":memory:" else None
+    cache_bytes = cache.max_bytes if cache is not None else None
+    pool = get_pdf_pool(n)
+    limit = max(1, int(max_pending or 2 * n))
+    pending: Dict[Future, Tuple[int, str]] = {}
+    it = enumerate(inputs)
+    exhausted = False
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < limit:
+                try:
+                    i, (source, file_name) = next(it)
+                except StopIteration:
+                    exhausted = True
+                    break
+                try:
+                    digest, hit = cached(source, file_name)
+                except Exception as e:
+                    yield i, file_name, [], [], {}, f"{type(e).__name__}: {e}"
+                    continue
+                if hit is not None:
+                    yield (i, file_name, *hit, None)
+                    continue
+                fut = pool.submit(
+                    _process_pdf_input, source, file_name, dict(kwargs, digest=digest), cache_path, cache_bytes
+                )
+                pending[fut] = (i, file_name)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i, file_name = pending.pop(fut)
+                try:
+                    dois_info, reference_lines, info = fut.result()
+                    yield i, file_name, dois_info, reference_lines, info, None
+                except Exception as e:
+                    yield i, file_name, [], [], {}, f"{type(e).__name__}: {e}"
+    finally:
+        for fut in pending:
+            fut.cancel()
@@ -0,0 +1,620 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from batch import result_row
+from documento import process_pdfs_parallel
+from src.doi_extract import doi_key, scan_dois
+from src.extract_cache import ExtractionCache
+from src.metadata import crossref_titles_by_dois
+from src.prefixes import PrefixRegistry, default_prefixes_path
+from src.resolver import DOIResolver
+from src.singleflight import SingleFlightCache
+from src.store import ValidationStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "error"
+CANCELLED = "cancelled"
+_FINISHED = (DONE, FAILED, CANCELLED)
+
+_MAX_PDF_BYTES = 300 << 20
+_MAX_JSON_BYTES = 20 << 20
+_BODY_CHUNK = 1 << 20
+_ENRICH_BATCH = 20
+
+
+def default_service_url() -> str:
+    return os.environ.get("DOI_SERVICE_URL", "")
+
+
+# =========================================================
+# Trabajos
+# =========================================================
+class Job:
+    """Un lote (PDF o lista de DOIs). Los resultados se acumulan en orden de llegada;
+    los lectores esperan en `cond` (sondeo con `offset` o streaming)."""
+
+    def __init__(self, kind: str, name: str, options: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.name = name
+        self.options = options
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.total = 0
+        self.results: List[Dict[str, Any]] = []
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.cancelled = threading.Event()
+        self.cond = threading.Condition()
+        self.payload: Any = None  # texto/DOIs o ruta del PDF temporal
+
+    def publish(self, rows: Iterable[Dict[str, Any]]) -> None:
+        with self.cond:
+            self.results.extend(rows)
+            self.cond.notify_all()
+
+    def start(self) -> bool:
+        """Pasa a `running`; False si ya terminó (cancelado mientras estaba en cola)."""
+        with self.cond:
+            if self.status in _FINISHED:
+                return False
+            self.status = RUNNING
+            self.cond.notify_all()
+            return True
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        with self.cond:
+            self.status = status
+            self.error = error
+            self.finished = time.time()
+            self.cond.notify_all()
+
+    def read(self, offset: int = 0, timeout: Optional[float] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """Resultados desde `offset` (esperando hasta `timeout` si aún no hay) y si el trabajo terminó."""
+        with self.cond:
+            if timeout and len(self.results) <= offset and self.status not in _FINISHED:
+                self.cond.wait(timeout)
+            return self.results[offset:], self.status in _FINISHED
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            "done": len(self.results),
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+class ValidationService:
+    """Cola de trabajos con recursos compartidos por todos los clientes: un único
+    `DOIResolver` (pool keep-alive y control de ritmo), una caché single-flight
+    acotada, el almacén SQLite y un pool de hilos de validación. Dos analistas que
+    validan el mismo DOI a la vez generan una sola consulta a doi.org.
+    """
+
+    def __init__(
+        self,
+        validate_workers: int = 16,
+        job_workers: int = 2,
+        pdf_workers: Optional[int] = None,
+        timeout_sec: float = 15.0,
+        retries: int = 2,
+        cache_size: int = 100_000,
+        job_ttl: float = 3600.0,
+    ):
+        self.registry = PrefixRegistry.load(default_prefixes_path())
+        self.resolver = DOIResolver(
+            timeout=timeout_sec, max_retries=retries, pool_size=int(validate_workers), prefixes=self.registry
+        )
+        self.store = ValidationStore()
+        self.cache = SingleFlightCache(max_size=cache_size)
+        self.extract_cache = ExtractionCache()
+        self.pdf_workers = pdf_workers
+        self.timeout_sec = float(timeout_sec)
+        self.job_ttl = float(job_ttl)
+        self._pool = ThreadPoolExecutor(max_workers=int(validate_workers), thread_name_prefix="svc-validate")
+        self._jobs: Dict[str, Job] = {}
+        self._jobs_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._runners = [
+            threading.Thread(target=self._run_loop, name=f"svc-job-{i}", daemon=True) for i in range(max(1, int(job_workers)))
+        ]
+        for t in self._runners:
+            t.start()
+
+    # -----------------------------------------------------
+    # API
+    # -----------------------------------------------------
+    def submit(self, kind: str, payload: Any, name: str = "", **options: Any) -> Job:
+        """`kind="dois"`: `payload` es texto libre o lista de DOIs. `kind="pdf"`: ruta a
+        un PDF temporal (el servicio lo borra al terminar)."""
+        if kind not in ("dois", "pdf"):
+            raise ValueError(f"Tipo de trabajo desconocido: {kind!r}")
+        job = Job(kind, name or kind, options)
+        job.payload = payload
+        with self._jobs_lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is not None:
+            with job.cond:
+                if job.status not in _FINISHED:
+                    job.cancelled.set()
+                    if job.status == QUEUED:
+                        job.finish(CANCELLED)
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._jobs_lock:
+            by_status: Dict[str, int] = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {"jobs": by_status, "queued": self._queue.qsize(), "cache": self.cache.stats()}
+
+    def close(self) -> None:
+        for _ in self._runners:
+            self._queue.put(None)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.store.flush()
+        if self.registry.dirty:
+            self.registry.save(default_prefixes_path())
+
+    # -----------------------------------------------------
+    # Ejecución
+    # -----------------------------------------------------
+    def _prune(self) -> None:
+        # bajo `_jobs_lock`: olvida trabajos terminados hace más de `job_ttl`
+        limit = time.time() - self.job_ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished is not None and j.finished < limit]:
+            del self._jobs[job_id]
+
+    def _run_loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.cancelled.is_set() or not job.start():
+                self._cleanup(job)
+                continue
+            try:
+                self._run(job)
+                job.finish(CANCELLED if job.cancelled.is_set() else DONE)
+            except Exception as e:
+                job.finish(FAILED, f"{type(e).__name__}: {e}")
+            finally:
+                self._cleanup(job)
+
+    def _cleanup(self, job: Job) -> None:
+        if job.kind == "pdf" and job.payload:
+            try:
+                os.unlink(job.payload)
+            except OSError:
+                pass
+        job.payload = None
+
+    def _extract(self, job: Job) -> List[Dict[str, Any]]:
+        if job.kind == "dois":
+            payload = job.payload
+            text = "\n".join(payload) if isinstance(payload, list) else str(payload or "")
+            rows = scan_dois(text)
+            for d in rows:
+                d.update(source=job.name, file_name=job.name, page="N/A", reference_line="")
+            return rows
+        for _i, _name, dois_info, _refs, _info, err in process_pdfs_parallel(
+            [(job.payload, job.name)],
+            workers=self.pdf_workers,
+            mode=job.options.get("mode", "refs"),
+            max_pages_from_end=int(job.options.get("pages", 10)),
+            backend=job.options.get("backend", "auto"),
+            cache=self.extract_cache,
+        ):
+            if err:
+                raise RuntimeError(err)
+            for d in dois_info:
+                d.setdefault("source", job.name)
+            return dois_info
+        return []
+
+    def _validate(self, doi: str):
+        fresh = doi_key(doi) not in self.cache
+        res = self.resolver.validate(doi, cache=self.cache)
+        if fresh:
+            self.store.put_result(*res)
+        return res
+
+    def _enrich(self, dois: List[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        found = self.store.get_crossref(dois)
+        missing = [d for d in dois if doi_key(d) not in found]
+        for key, (title, src) in crossref_titles_by_dois(missing, timeout=self.timeout_sec).items():
+            found[key] = (title, src)
+            self.store.put_crossref(key, title, src)
+        return found
+
+    def _run(self, job: Job) -> None:
+        seen = set()
+        rows = []
+        for d in self._extract(job):
+            k = doi_key(d["doi"])
+            if k and k not in seen:
+                seen.add(k)
+                rows.append(d)
+        job.total = len(rows)
+        # lectura masiva del almacén persistente: los aciertos no tocan la red
+        self.cache.update(self.store.get_results(d["doi"] for d in rows if doi_key(d["doi"]) not in self.cache))
+
+        crossref = bool(job.options.get("crossref"))
+        pending = {self._pool.submit(self._validate, d["doi"]): d for d in rows}
+        batch: List[Tuple[Dict[str, Any], Any]] = []
+        while pending:
+            if job.cancelled.is_set():
+                for fut in pending:
+                    fut.cancel()
+                return
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                d = pending.pop(fut)
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = (d["doi"], False, "unknown", 0, f"⚠️ Error: {type(e).__name__}: {str(e)[:80]}", 0.0)
+                batch.append((d, res))
+            if batch and (not crossref or len(batch) >= _ENRICH_BATCH or not pending):
+                self._publish(job, batch, crossref)
+                batch = []
+
+    def _publish(self, job: Job, batch: List[Tuple[Dict[str, Any], Any]], crossref: bool) -> None:
+        found: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        if crossref:
+            try:
+                found = self._enrich([res[0] for _d, res in batch])
+            except Exception:
+                found = {}
+        job.publish(
+            result_row(d, res, found.get(doi_key(res[0]), (None, None)) if crossref else None) for d, res in batch
+        )
+
+
+# =========================================================
+# HTTP
+# =========================================================
+class _Handler(BaseHTTPRequestHandler):
+    """Rutas:
+    - `POST /jobs?kind=dois` (JSON `{"dois": [...]}` o `{"text": "..."}`) o
+      `POST /jobs?kind=pdf&name=archivo.pdf` (cuerpo = PDF). Opciones: `crossref=1`,
+      `mode`, `pages`, `backend`. Devuelve el resumen del trabajo (`id`).
+    - `GET /jobs/<id>?offset=N&wait=S`: estado + resultados desde `offset` (sondeo largo opcional).
+    - `GET /jobs/<id>/stream?offset=N`: resultados en NDJSON a medida que llegan;
+      la última línea es `{"event": "end", ...}`.
+    - `DELETE /jobs/<id>`: cancela.
+    - `GET /health`: trabajos por estado y estadísticas de la caché compartida.
+    """
+
+    service: ValidationService
+    server_version = "DOIValidator/1.0"
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, code: int, obj: Any) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self) -> Tuple[List[str], Dict[str, str]]:
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return [p for p in url.path.split("/") if p], query
+
+    def do_GET(self) -> None:
+        parts, query = self._route()
+        if parts == ["health"]:
+            return self._send_json(200, {"ok": True, **self.service.stats()})
+        if len(parts) < 2 or parts[0] != "jobs":
+            return self._send_json(404, {"error": "not found"})
+        job = self.service.get(parts[1])
+        if job is None:
+            return self._send_json(404, {"error": "job not found"})
+        try:
+            offset = max(0, int(query.get("offset", 0)))
+            wait = min(30.0, max(0.0, float(query.get("wait", 0))))
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        if parts[2:] == ["stream"]:
+            return self._stream(job, offset)
+        rows, _ = job.read(offset, timeout=wait)
+        self._send_json(200, {**job.summary(), "offset": offset, "next": offset + len(rows), "results": rows})
+
+    def _stream(self, job: Job, offset: int) -> None:
+        # HTTP/1.0: el cuerpo termina al cerrar la conexión
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        try:
+            while True:
+                rows, finished = job.read(offset, timeout=1.0)
+                for row in rows:
+                    self.wfile.write((json.dumps({"event": "result", **row}, ensure_ascii=False) + "\n").encode("utf-8"))
+                offset += len(rows)
+                if rows:
+                    self.wfile.flush()
+                if finished and not job.read(offset)[0]:
+                    end = {"event": "end", **job.summary()}
+                    self.wfile.write((json.dumps(end, ensure_ascii=False) + "\n").encode("utf-8"))
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def do_POST(self) -> None:
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            return self._send_json(404, {"error": "not found"})
+        kind = query.get("kind") or ("pdf" if "pdf" in (self.headers.get("Content-Type") or "") else "dois")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            options = {
+                "crossref": query.get("crossref") in ("1", "true", "yes"),
+                "mode": query.get("mode", "refs"),
+                "pages": int(query.get("pages", 10)),
+                "backend": query.get("backend", "auto"),
+            }
+            if kind == "pdf":
+                if length <= 0 or length > _MAX_PDF_BYTES:
+                    return self._send_json(413 if length > 0 else 400, {"error": "PDF vacío o demasiado grande"})
+                payload = self._spool_body(length)
+            else:
+                if length < 0 or length > _MAX_JSON_BYTES:
+                    return self._send_json(413 if length > 0 else 400, {"error": "Cuerpo JSON inválido o demasiado grande"})
+                body = self.rfile.read(length)
+                if len(body) < length:
+                    raise ValueError(f"Cuerpo incompleto: {len(body)} de {length} bytes")
+                data = json.loads(body.decode("utf-8") or "{}")
+                payload = data.get("dois") if data.get("dois") is not None else data.get("text", "")
+            job = self.service.submit(kind, payload, name=query.get("name", ""), **options)
+        except (ValueError, UnicodeDecodeError) as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, job.summary())
+
+    def _spool_body(self, length: int) -> str:
+        # el PDF va directo a disco por bloques (los workers de extracción reciben la ruta)
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as out:
+            left = length
+            while left > 0:
+                block = self.rfile.read(min(_BODY_CHUNK, left))
+                if not block:
+                    break
+                out.write(block)
+                left -= len(block)
+        if left > 0:
+            # conexión cortada antes de Content-Length: no se encola un PDF truncado
+            os.unlink(path)
+            raise ValueError(f"Cuerpo incompleto: {length - left} de {length} bytes")
+        return path
+
+    def do_DELETE(self) -> None:
+        parts, _ = self._route()
+        job = self.service.cancel(parts[1]) if len(parts) == 2 and parts[0] == "jobs" else None
+        if job is None:
+            return self._send_json(404, {"error": "job not found"})
+        self._send_json(200, job.summary())
+
+
+def make_server(service: ValidationService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, int(port)), handler)
+    server.daemon_threads = True
+    return server
+
+
+# =========================================================
+# Cliente (lo usa la app de Streamlit)
+# =========================================================
+class ServiceClient:
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = float(timeout)
+        self.session = requests.Session()
+
+    def health(self) -> Dict[str, Any]:
+        r = self.session.get(f"{self.base_url}/health", timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def submit_dois(self, dois: List[str], name: str = "", crossref: bool = False) -> str:
+        r = self.session.post(
+            f"{self.base_url}/jobs",
+            params={"kind": "dois", "name": name, "crossref": int(bool(crossref))},
+            json={"dois": list(dois)},
+            timeout=self.timeout,
+        )
+        r.raise_for_status()
+        return r.json()["id"]
+
+    def submit_pdf(self, path: str, name: str = "", crossref: bool = False, **options: Any) -> str:
+        with open(path, "rb") as fh:
+            r = self.session.post(
+                f"{self.base_url}/jobs",
+                params={"kind": "pdf", "name": name or os.path.basename(path), "crossref": int(bool(crossref)), **options},
+                data=fh,
+                headers={"Content-Type": "application/pdf", "Content-Length": str(os.path.getsize(path))},
+                timeout=self.timeout,
+            )
+        r.raise_for_status()
+        return r.json()["id"]
+
+    def status(self, job_id: str, offset: int = 0, wait: float = 0.0) -> Dict[str, Any]:
+        r = self.session.get(
+            f"{self.base_url}/jobs/{job_id}", params={"offset": offset, "wait": wait}, timeout=self.timeout + wait
+        )
+        r.raise_for_status()
+        return r.json()
+
+    def stream(self, job_id: str, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Filas del trabajo a medida que llegan; la última tiene `event == "end"`."""
+        with self.session.get(
+            f"{self.base_url}/jobs/{job_id}/stream", params={"offset": offset}, stream=True, timeout=(self.timeout, None)
+        ) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def cancel(self, job_id: str) -> None:
+        try:
+            self.session.delete(f"{self.base_url}/jobs/{job_id}", timeout=self.timeout)
+        except requests.RequestException:
+            pass
+
+
+def run_remote_pipeline(
+    extracted: Iterable[Tuple[Any, List[Dict[str, Any]]]],
+    client: ServiceClient,
+    crossref: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Como `src.pipeline.run_pipeline`, pero la validación (y Crossref) la hace el
+    servicio: un trabajo por fuente, enviado en cuanto se extrae. Mismos eventos
+    (`source`, `result`, `error`), así que la app los consume igual.
+    """
+    events: "queue.Queue" = queue.Queue(maxsize=256)
+    stop = threading.Event()
+    end = object()
+
+    def put(item: Any) -> None:
+        while not stop.is_set():
+            try:
+                events.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def submit_stage() -> None:
+        seen = set()
+        try:
+            for source, rows in extracted:
+                if stop.is_set():
+                    return
+                infos: Dict[str, Dict[str, Any]] = {}
+                for d in rows or []:
+                    k = doi_key(d.get("doi") or "")
+                    if k and k not in seen:
+                        seen.add(k)
+                        infos[k] = d
+                put({"type": "source", "source": source, "found": len(rows or []), "new": len(infos)})
+                if infos:
+                    try:
+                        job_id = client.submit_dois([d["doi"] for d in infos.values()], name=str(source), crossref=crossref)
+                    except Exception as e:
+                        # un envío fallido no corta las demás fuentes
+                        put({"type": "error", "stage": "submit", "source": source, "error": e})
+                        continue
+                    put(("job", job_id, infos))
+        except Exception as e:
+            put({"type": "error", "stage": "extract", "source": None, "error": e})
+        finally:
+            put(end)
+
+    thread = threading.Thread(target=submit_stage, name="remote-submit", daemon=True)
+    thread.start()
+    open_jobs: List[str] = []
+    try:
+        while True:
+            item = events.get()
+            if item is end:
+                break
+            if isinstance(item, dict):
+                yield item
+                continue
+            _, job_id, infos = item
+            open_jobs.append(job_id)
+            try:
+                for row in client.stream(job_id):
+                    if row.get("event") == "end":
+                        if row.get("status") == FAILED:
+                            yield {"type": "error", "stage": "validate", "source": row.get("name"), "error": row.get("error")}
+                        break
+                    result = (row["doi"], row["ok"], row["category"], row["status"], row["message"], row["time"])
+                    yield {
+                        "type": "result",
+                        "info": infos.get(doi_key(row["doi"]), {"doi": row["doi"]}),
+                        "result": result,
+                        "crossref": (row.get("crossref_title"), row.get("crossref_source")) if crossref else None,
+                    }
+            except requests.RequestException as e:
+                yield {"type": "error", "stage": "validate", "source": job_id, "error": e}
+            open_jobs.pop()
+    finally:
+        stop.set()
+        for job_id in open_jobs:
+            client.cancel(job_id)
+        thread.join(timeout=1.0)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(
+        description="Servicio local de validación de DOIs: cola de trabajos con caché y pool compartidos."
+    )
+    ap.add_argument("--host", default=DEFAULT_HOST)
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--workers", type=int, default=16, help="Hilos de validación compartidos")
+    ap.add_argument("--job-workers", type=int, default=2, help="Trabajos en ejecución a la vez")
+    ap.add_argument("--pdf-workers", type=int, default=None, help="Procesos de extracción")
+    ap.add_argument("--timeout", type=float, default=15.0)
+    ap.add_argument("--retries", type=int, default=2)
+    args = ap.parse_args(argv)
+
+    service = ValidationService(
+        validate_workers=args.workers,
+        job_workers=args.job_workers,
+        pdf_workers=args.pdf_workers,
+        timeout_sec=args.timeout,
+        retries=args.retries,
+    )
+    server = make_server(service, args.host, args.port)
+    print(f"Servicio de validación en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()